@@ -2,22 +2,33 @@
 # Imports
 # ----------------------------------------------------------------------------#
 
-import logging
 import os
 import sys
-from datetime import datetime
-from logging import Formatter, FileHandler
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 
 import babel
+import babel.dates
 import dateutil.parser
-from flask import render_template, request, flash
+from flask import render_template, request, flash, abort, jsonify, Response, stream_with_context
 from flask_bootstrap import Bootstrap
 from flask_moment import Moment
-from flask_wtf.csrf import CSRFProtect
-from sqlalchemy import func
-
-from forms import VenueForm, ArtistForm, ShowForm
+from flask_wtf.csrf import CSRFProtect, generate_csrf
+from psycopg2 import errorcodes
+from sqlalchemy import func, tuple_, cast, case, or_, literal, union_all, desc, select
+from sqlalchemy.dialects.postgresql import array
+from sqlalchemy.exc import IntegrityError
+
+from assets import AssetPipeline
+from cache import ResponseCache, conditional
+from commands import shows_cli, import_cli, assets_cli
+from counters import lock_show_counters, add_shows_to_counters
+from db_pool import init_db_pool, pool_stats
+from forms import VenueForm, ArtistForm, ShowForm, genres_data, MAX_SHOW_DURATION
 from models import app, db, Venue, Artist, Show
+from name_index import NameIndex
+from query_profiler import QueryProfiler
+from request_log import init_logging, logging_stats
 
 # ----------------------------------------------------------------------------#
 # App Config.
@@ -27,20 +38,43 @@ app.config.from_object('config')
 CSRFProtect(app)
 Bootstrap(app)
 Moment(app)
-db.init_app(app)
+init_db_pool(app, db)
+app.cli.add_command(shows_cli)
+app.cli.add_command(import_cli)
+app.cli.add_command(assets_cli)
+AssetPipeline(app)
+response_cache = ResponseCache(app)
+query_profiler = QueryProfiler(app)
+name_index = NameIndex(app)
+if not app.debug:
+    init_logging(app)
 
 
 # ----------------------------------------------------------------------------#
 # Filters.
 # ----------------------------------------------------------------------------#
 
-def format_datetime(value, format_param='medium'):
-    date = dateutil.parser.parse(value)
-    if format_param == 'full':
-        format_param = "EEEE MMMM, d, y 'at' h:mma"
-    elif format_param == 'medium':
-        format_param = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format_param)
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma"
+}
+
+
+@lru_cache(maxsize=None)
+def compile_datetime_format(format_param, locale):
+    # compiled once per format and locale instead of on every formatted value
+    pattern = babel.dates.parse_pattern(DATETIME_FORMATS.get(format_param, format_param))
+    return pattern, babel.Locale.parse(locale)
+
+
+def format_datetime(value, format_param='medium', locale=babel.dates.LC_TIME):
+    # values are naive UTC datetimes from the database, strings are still accepted
+    if isinstance(value, str):
+        value = dateutil.parser.parse(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=babel.dates.UTC)
+    pattern, locale = compile_datetime_format(format_param, locale)
+    return pattern.apply(value, locale)
 
 
 app.jinja_env.filters['datetime'] = format_datetime
@@ -59,23 +93,20 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@response_cache.cached
 def venues():
     data = []
-    distinct_cities = Venue.query.distinct(Venue.city, Venue.state).all()
-    for i in distinct_cities:
-        venues_data = []
-        venues_in_city = Venue.query.filter_by(city=i.city, state=i.state).all()
-        for j in venues_in_city:
-            upcoming_shows = get_upcoming_shows(query_shows_of_venue(j.id))
-            venues_data.append({
-                'id': j.id,
-                'name': j.name,
-                'num_upcoming_shows': len(upcoming_shows)
+    for i in query_venues_with_upcoming_shows_count():
+        if not data or (data[-1]['city'], data[-1]['state']) != (i.city, i.state):
+            data.append({
+                'city': i.city,
+                'state': i.state,
+                'venues': []
             })
-        data.append({
-            'city': i.city,
-            'state': i.state,
-            'venues': venues_data
+        data[-1]['venues'].append({
+            'id': i.id,
+            'name': i.name,
+            'num_upcoming_shows': i.upcoming_shows_count
         })
     return render_template('pages/venues.html', areas=data)
 
@@ -83,46 +114,77 @@ def venues():
 @app.route('/venues/search', methods=['POST'])
 def search_venues():
     search_term = request.form.get('search_term', '')
-    query = Venue.query.filter(Venue.name.ilike(f'%{search_term}%'))
-    results = query.all()
-    count = query.count()
+    results = search_by_name(Venue, search_term)
     data = []
     for i in results:
-        upcoming_shows = get_upcoming_shows(query_shows_of_venue(i.id))
         data.append({
             "id": i.id,
             "name": i.name,
-            "num_upcoming_shows": len(upcoming_shows)
+            "num_upcoming_shows": i.upcoming_shows_count
         })
     response = {
-        "count": count,
+        "count": results[0].total_count if results else 0,
         "data": data
     }
     return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
 
+@app.route('/search', methods=['POST'])
+def search():
+    search_term = request.form.get('search_term', '')
+    results = search_venues_and_artists(search_term, app.config['SEARCH_RESULTS_LIMIT'])
+    response = {
+        "count": results[0].total_count if results else 0,
+        "data": [search_result(i) for i in results]
+    }
+    return render_template('pages/search.html', results=response, search_term=search_term)
+
+
+@app.route('/search/suggest')
+def search_suggest():
+    # autocomplete: ?q= and ?limit=, at most SEARCH_RESULTS_LIMIT
+    search_term = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', app.config['SEARCH_SUGGEST_LIMIT'], type=int),
+                app.config['SEARCH_RESULTS_LIMIT'])
+    if not search_term or limit <= 0:
+        return jsonify(results=[])
+    return jsonify(results=[search_result(i) for i in search_venues_and_artists(search_term, limit)])
+
+
+@app.route('/autocomplete')
+def autocomplete():
+    # ?q= name prefix and ?limit=, answered from the in-process name index or, while it loads, from the database
+    prefix = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', app.config['SEARCH_SUGGEST_LIMIT'], type=int),
+                app.config['SEARCH_RESULTS_LIMIT'])
+    if not prefix or limit <= 0:
+        return jsonify(results=[])
+    results = name_index.search(prefix, limit)
+    if results is None:
+        results = [{"type": i.type, "id": i.id, "name": i.name} for i in search_venues_and_artists(prefix, limit)]
+    return jsonify(results=results)
+
+
+@app.route('/venues/facets')
+def venue_facets():
+    return jsonify(genres=count_genres(Venue))
+
+
 @app.route('/venues/<int:venue_id>')
+@conditional(lambda venue_id: query_page_validators(Venue, venue_id))
+@response_cache.cached
 def show_venue(venue_id):
-    venue = Venue.query.get(venue_id)
-    shows_query = query_shows_of_venue(venue_id)
-    past_shows_data = get_past_shows(shows_query)
-    upcoming_shows_data = get_upcoming_shows(shows_query)
-    past_shows = []
-    for i in past_shows_data:
-        past_shows.append({
-            "artist_id": i.artist.id,
-            "artist_name": i.artist.name,
-            "artist_image_link": i.artist.image_link,
-            "start_time": datetime_to_string(i.start_time)
-        })
-    upcoming_shows = []
-    for i in upcoming_shows_data:
-        upcoming_shows.append({
-            "artist_id": i.artist.id,
-            "artist_name": i.artist.name,
-            "artist_image_link": i.artist.image_link,
-            "start_time": datetime_to_string(i.start_time)
-        })
+    rows = query_venue_page(venue_id)
+    if not rows:
+        abort(404)
+    venue = rows[0]
+    past_shows, upcoming_shows = split_past_and_upcoming_shows(rows, lambda i: {
+        "artist_id": i.artist_id,
+        "artist_name": i.artist_name,
+        "artist_image_link": i.artist_image_link,
+        "start_time": i.start_time
+    })
+    expire_cached_page_at_next_show(rows, upcoming_shows)
     data = {
         "id": venue.id,
         "name": venue.name,
@@ -158,20 +220,14 @@ def create_venue_submission():
     form = VenueForm()
     if form.validate_on_submit():
         try:
-            venue = Venue(name=form.name.data,
-                          city=form.city.data,
-                          state=form.state.data,
-                          address=form.address.data,
-                          phone=form.phone.data,
-                          image_link=form.image_link.data if form.image_link.data else None,
-                          facebook_link=form.facebook_link.data if form.facebook_link.data else None,
-                          genres=form.genres.data,
-                          website=form.website.data if form.website.data else None,
-                          seeking_talent=True if form.seeking_talent_description.data else False,
-                          seeking_description=form.seeking_talent_description.data
-                          if form.seeking_talent_description.data else None)
+            venue = Venue(**form.model_values())
             db.session.add(venue)
+            # flushed for the id, reading it after the commit would refresh the venue with another query
+            db.session.flush()
+            venue_id = venue.id
             db.session.commit()
+            response_cache.invalidate('/venues')
+            name_index.add('venue', venue_id, form.name.data)
             flash('Venue ' + form.name.data + ' was successfully listed!')
             return render_template('pages/home.html')
         except Exception:
@@ -179,8 +235,6 @@ def create_venue_submission():
             print(sys.exc_info())
             flash('An error occurred. Venue ' + form.name.data + ' could not be listed.')
             return render_template('pages/home.html')
-        finally:
-            db.session.close()
     else:
         return render_template('forms/new_venue.html', form=form)
 
@@ -188,62 +242,56 @@ def create_venue_submission():
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@response_cache.cached
 def artists():
-    data = []
-    all_artists = Artist.query.all()
-    for i in all_artists:
-        upcoming_shows = get_upcoming_shows(query_shows_of_artist(i.id))
-        data.append({
-            "id": i.id,
-            "name": i.name,
-            "num_upcoming_shows": len(upcoming_shows)
-        })
-    return render_template('pages/artists.html', artists=data)
+    query = filter_by_genre_and_area(db.session.query(Artist.id, Artist.name, Artist.upcoming_shows_count), Artist) \
+        .order_by(Artist.id)
+    data = ({
+        "id": i.id,
+        "name": i.name,
+        "num_upcoming_shows": i.upcoming_shows_count
+    } for i in listing_rows(query))
+    return render_listing('pages/artists.html', artists=data)
 
 
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
     search_term = request.form.get('search_term', '')
-    query = Artist.query.filter(func.lower(Artist.name).contains(func.lower(search_term)))
-    results = query.all()
-    count = query.count()
+    results = search_by_name(Artist, search_term)
     data = []
     for i in results:
-        upcoming_shows = get_upcoming_shows(query_shows_of_artist(i.id))
         data.append({
             "id": i.id,
             "name": i.name,
-            "num_upcoming_shows": len(upcoming_shows)
+            "num_upcoming_shows": i.upcoming_shows_count
         })
     response = {
-        "count": count,
+        "count": results[0].total_count if results else 0,
         "data": data
     }
     return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
 
+@app.route('/artists/facets')
+def artist_facets():
+    return jsonify(genres=count_genres(Artist))
+
+
 @app.route('/artists/<int:artist_id>')
+@conditional(lambda artist_id: query_page_validators(Artist, artist_id))
+@response_cache.cached
 def show_artist(artist_id):
-    artist = Artist.query.get(artist_id)
-    shows_query = query_shows_of_artist(artist_id)
-    past_shows_data = get_past_shows(shows_query)
-    upcoming_shows_data = get_upcoming_shows(shows_query)
-    past_shows = []
-    for i in past_shows_data:
-        past_shows.append({
-            "venue_id": i.venue.id,
-            "venue_name": i.venue.name,
-            "venue_image_link": i.venue.image_link,
-            "start_time": datetime_to_string(i.start_time)
-        })
-    upcoming_shows = []
-    for i in upcoming_shows_data:
-        upcoming_shows.append({
-            "venue_id": i.venue.id,
-            "venue_name": i.venue.name,
-            "venue_image_link": i.venue.image_link,
-            "start_time": datetime_to_string(i.start_time)
-        })
+    rows = query_artist_page(artist_id)
+    if not rows:
+        abort(404)
+    artist = rows[0]
+    past_shows, upcoming_shows = split_past_and_upcoming_shows(rows, lambda i: {
+        "venue_id": i.venue_id,
+        "venue_name": i.venue_name,
+        "venue_image_link": i.venue_image_link,
+        "start_time": i.start_time
+    })
+    expire_cached_page_at_next_show(rows, upcoming_shows)
     data = {
         "id": artist.id,
         "name": artist.name,
@@ -278,19 +326,14 @@ def create_artist_submission():
     form = ArtistForm()
     if form.validate_on_submit():
         try:
-            artist = Artist(name=form.name.data,
-                            city=form.city.data,
-                            state=form.state.data,
-                            phone=form.phone.data,
-                            image_link=form.image_link.data if form.image_link.data else None,
-                            facebook_link=form.facebook_link.data if form.facebook_link.data else None,
-                            genres=form.genres.data,
-                            website=form.website.data if form.website.data else None,
-                            seeking_venue=True if form.seeking_venue_description.data else False,
-                            seeking_description=form.seeking_venue_description.data
-                            if form.seeking_venue_description.data else None)
+            artist = Artist(**form.model_values())
             db.session.add(artist)
+            # flushed for the id, reading it after the commit would refresh the artist with another query
+            db.session.flush()
+            artist_id = artist.id
             db.session.commit()
+            response_cache.invalidate('/artists')
+            name_index.add('artist', artist_id, form.name.data)
             flash('Artist ' + form.name.data + ' was successfully listed!')
             return render_template('pages/home.html')
         except Exception:
@@ -298,8 +341,6 @@ def create_artist_submission():
             print(sys.exc_info())
             flash('An error occurred. Artist ' + form.name.data + ' could not be listed.')
             return render_template('pages/home.html')
-        finally:
-            db.session.close()
     else:
         return render_template('forms/new_artist.html', form=form)
 
@@ -309,18 +350,20 @@ def create_artist_submission():
 
 @app.route('/shows')
 def shows():
-    data = []
-    shows_data = Show.query.all()
-    for i in shows_data:
-        data.append({
-            "venue_id": i.venue.id,
-            "venue_name": i.venue.name,
-            "artist_id": i.artist.id,
-            "artist_name": i.artist.name,
-            "artist_image_link": i.artist.image_link,
-            "start_time": datetime_to_string(i.start_time)
-        })
-    return render_template('pages/shows.html', shows=data)
+    page_size = app.config['SHOWS_PER_PAGE']
+    after = parse_show_cursor(request.args.get('after'))
+    before = parse_show_cursor(request.args.get('before'))
+    rows = listing_rows(query_shows_page(after, before, page_size + 1))
+    pagination = {"prev": None, "next": None}
+    data = ({
+        "venue_id": i.venue_id,
+        "venue_name": i.venue_name,
+        "artist_id": i.artist_id,
+        "artist_name": i.artist_name,
+        "artist_image_link": i.artist_image_link,
+        "start_time": i.start_time
+    } for i in paginate_shows(rows, after, before, page_size, pagination))
+    return render_listing('pages/shows.html', shows=data, pagination=pagination)
 
 
 @app.route('/shows/create')
@@ -335,63 +378,329 @@ def create_show_submission():
     form = ShowForm()
     if form.validate_on_submit():
         try:
-            show = Show(artist_id=form.artist_id.data,
-                        venue_id=form.venue_id.data,
-                        start_time=form.start_time.data)
+            synced_at = lock_show_counters()
+            show = Show(**form.model_values())
             db.session.add(show)
+            add_shows_to_counters([(show.venue_id, show.artist_id, show.start_time)], synced_at)
             db.session.commit()
+            response_cache.invalidate('/venues', '/artists',
+                                      f'/venues/{form.venue_id.data}', f'/artists/{form.artist_id.data}')
             flash('Show was successfully listed!')
             return render_template('pages/home.html')
+        except IntegrityError as error:
+            db.session.rollback()
+            if error.orig.pgcode == errorcodes.EXCLUSION_VIOLATION:
+                booked = 'venue' if error.orig.diag.constraint_name == 'ex_shows_venue_id_during' else 'artist'
+                form.start_time.errors.append(f'The {booked} already has a show at that time.')
+                return render_template('forms/new_show.html', form=form)
+            print(sys.exc_info())
+            flash('An error occurred. Show could not be listed.')
+            return render_template('pages/home.html')
         except Exception:
             db.session.rollback()
             print(sys.exc_info())
             flash('An error occurred. Show could not be listed.')
             return render_template('pages/home.html')
-        finally:
-            db.session.close()
     else:
         return render_template('forms/new_show.html', form=form)
 
 
-@app.errorhandler(404)
-def not_found_error(error):
-    return render_template('errors/404.html'), 404
+@app.route('/shows/availability')
+def show_availability():
+    # ?venue_id= and/or ?artist_id=, ?start_time= (ISO 8601, naive times are UTC) and ?duration= in minutes
+    venue_id = request.args.get('venue_id', type=int)
+    artist_id = request.args.get('artist_id', type=int)
+    duration = request.args.get('duration', 120, type=int)
+    if (venue_id is None and artist_id is None) or not 1 <= duration <= MAX_SHOW_DURATION:
+        abort(400)
+    start_time = request.args.get('start_time', '')
+    try:
+        # a trailing Z is only understood by fromisoformat since Python 3.11
+        start_time = datetime.fromisoformat(start_time[:-1] + '+00:00' if start_time.endswith('Z') else start_time)
+        if start_time.tzinfo is not None:
+            # shows are stored as naive UTC, an aware value would be sent as timestamptz
+            start_time = start_time.astimezone(timezone.utc).replace(tzinfo=None)
+        end_time = start_time + timedelta(minutes=duration)
+    except (ValueError, OverflowError):
+        abort(400)
+    conflicts = query_conflicting_shows(venue_id, artist_id, start_time, end_time)
+    return jsonify(available=not conflicts, conflicts=[{
+        "id": i.id,
+        "venue_id": i.venue_id,
+        "artist_id": i.artist_id,
+        "start_time": i.start_time.isoformat(),
+        "end_time": i.end_time.isoformat()
+    } for i in conflicts])
 
 
-@app.errorhandler(500)
-def server_error(error):
-    return render_template('errors/500.html'), 500
+@app.route('/stats/cache')
+def cache_stats():
+    return jsonify(response_cache.stats())
 
 
-def query_shows_of_venue(venue_id):
-    return db.session.query(Show).join(Venue).filter(Show.venue_id == venue_id)
+@app.route('/stats/pool')
+def db_pool_stats():
+    return jsonify(pool_stats(db.engine))
 
 
-def query_shows_of_artist(artist_id):
-    return db.session.query(Show).join(Artist).filter(Show.artist_id == artist_id)
+@app.route('/stats/logging')
+def request_log_stats():
+    return jsonify(logging_stats(app))
 
 
-def get_past_shows(shows_query):
-    return shows_query.filter(Show.start_time <= datetime.utcnow()).all()
+@app.route('/stats/name-index')
+def name_index_stats():
+    return jsonify(name_index.stats())
 
 
-def get_upcoming_shows(shows_query):
-    return shows_query.filter(Show.start_time > datetime.utcnow()).all()
+@app.route('/stats/queries')
+def query_stats():
+    return jsonify(routes=query_profiler.worst_routes(request.args.get('limit', 20, type=int)))
 
 
-def datetime_to_string(date_time):
-    return date_time.strftime("%m/%d/%Y, %H:%M:%S")
+@app.errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+@app.errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
+
+
+def query_venues_with_upcoming_shows_count():
+    # ordered so that venues of the same area are adjacent
+    query = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, Venue.upcoming_shows_count)
+    return filter_by_genre_and_area(query, Venue) \
+        .order_by(Venue.state, Venue.city, Venue.id) \
+        .all()
+
+
+def filter_by_genre_and_area(query, model):
+    # ?genre= (repeatable, all must match), ?city= and ?state= narrow listings, searches and genre facets
+    genres = request.values.getlist('genre')
+    city = request.values.get('city')
+    state = request.values.get('state')
+    if genres:
+        # cast so that the array types match and the GIN index on genres can serve the @> operator
+        query = query.filter(model.genres.op('@>')(cast(array(genres), model.genres.type)))
+    if city:
+        query = query.filter(func.lower(model.city) == city.lower())
+    if state:
+        query = query.filter(model.state == state.upper())
+    return query
+
+
+def count_genres(model):
+    # per-genre totals of the filtered venues or artists in one aggregate over the unnested genre arrays
+    genres = filter_by_genre_and_area(db.session.query(func.unnest(model.genres).label('genre')), model).subquery()
+    counts = dict(db.session.query(genres.c.genre, func.count()).group_by(genres.c.genre).all())
+    return [{'genre': genre, 'count': counts.get(genre, 0)} for genre, _ in genres_data]
+
+
+def search_by_name(model, search_term):
+    # case-insensitive partial match served by the pg_trgm GIN index on name, closest matches first; every row carries
+    # the number of matches before the limit as total_count
+    pattern = '%{}%'.format(search_term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+    query = db.session.query(model.id, model.name, model.upcoming_shows_count,
+                             func.count().over().label('total_count'))
+    return filter_by_genre_and_area(query, model) \
+        .filter(model.name.ilike(pattern, escape='\\')) \
+        .order_by(func.similarity(model.name, search_term).desc(), model.id) \
+        .limit(app.config['SEARCH_RESULTS_LIMIT']) \
+        .all()
+
+
+def search_venues_and_artists(search_term, limit):
+    # venues and artists ranked together in one UNION ALL, names starting with the term first, then by trigram
+    # similarity; terms too short for trigrams of their own only match the start of names, which the trigram
+    # indexes serve as well
+    escaped_term = search_term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    pattern = escaped_term + '%' if len(search_term) < 3 else '%' + escaped_term + '%'
+    ranked = []
+    for model, result_type in ((Venue, 'venue'), (Artist, 'artist')):
+        rank = case([(model.name.ilike(escaped_term + '%', escape='\\'), 1.0)], else_=0.0) \
+            + func.similarity(model.name, search_term)
+        query = db.session.query(literal(result_type).label('type'), model.id, model.name,
+                                 model.upcoming_shows_count, rank.label('rank'))
+        ranked.append(filter_by_genre_and_area(query, model)
+                      .filter(model.name.ilike(pattern, escape='\\'))
+                      .statement)
+    # total_count is the number of matches before the limit
+    matches = union_all(*ranked).alias('matches')
+    statement = select([matches, func.count().over().label('total_count')]) \
+        .order_by(desc(matches.c.rank), matches.c.type, matches.c.id) \
+        .limit(limit)
+    return db.session.execute(statement).fetchall()
+
+
+def search_result(row):
+    return {
+        "type": row.type,
+        "id": row.id,
+        "name": row.name,
+        "num_upcoming_shows": row.upcoming_shows_count
+    }
+
+
+def query_venue_page(venue_id):
+    # the venue joined with all its shows and their artists, one row per show (or a single row without shows)
+    return db.session.query(Venue.id, Venue.name, Venue.genres, Venue.address, Venue.city, Venue.state,
+                            Venue.phone, Venue.website, Venue.facebook_link, Venue.seeking_talent,
+                            Venue.seeking_description, Venue.image_link, Show.start_time,
+                            Artist.id.label('artist_id'), Artist.name.label('artist_name'),
+                            Artist.image_link.label('artist_image_link')) \
+        .outerjoin(Show, Show.venue_id == Venue.id) \
+        .outerjoin(Artist, Artist.id == Show.artist_id) \
+        .filter(Venue.id == venue_id) \
+        .order_by(Show.start_time) \
+        .all()
+
+
+def query_artist_page(artist_id):
+    # the artist joined with all its shows and their venues, one row per show (or a single row without shows)
+    return db.session.query(Artist.id, Artist.name, Artist.genres, Artist.city, Artist.state, Artist.phone,
+                            Artist.website, Artist.facebook_link, Artist.seeking_venue,
+                            Artist.seeking_description, Artist.image_link, Show.start_time,
+                            Venue.id.label('venue_id'), Venue.name.label('venue_name'),
+                            Venue.image_link.label('venue_image_link')) \
+        .outerjoin(Show, Show.artist_id == Artist.id) \
+        .outerjoin(Venue, Venue.id == Show.venue_id) \
+        .filter(Artist.id == artist_id) \
+        .order_by(Show.start_time) \
+        .all()
+
+
+def query_conflicting_shows(venue_id, artist_id, start_time, end_time):
+    # the shows of the venue or the artist overlapping the slot, found through the GiST indexes of the no overlap
+    # constraints
+    owners = []
+    if venue_id is not None:
+        owners.append(Show.venue_id == venue_id)
+    if artist_id is not None:
+        owners.append(Show.artist_id == artist_id)
+    return db.session.query(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.end_time) \
+        .filter(or_(*owners)) \
+        .filter(func.tsrange(Show.start_time, Show.end_time).op('&&')(func.tsrange(start_time, end_time))) \
+        .order_by(Show.start_time, Show.id) \
+        .all()
+
+
+def query_page_validators(model, entity_id):
+    # a venue or artist page changes when the entity, one of its shows or one of the artists or venues listed with
+    # them is written, and when one of its shows starts and moves from upcoming to past
+    other_model = Artist if model is Venue else Venue
+    show_foreign_key, other_foreign_key = (Show.venue_id, Show.artist_id) if model is Venue \
+        else (Show.artist_id, Show.venue_id)
+    now = datetime.utcnow()
+    row = db.session.query(model.updated_at, func.max(Show.updated_at), func.max(other_model.updated_at),
+                           func.max(case([(Show.start_time <= now, Show.start_time)])), func.count(Show.id)) \
+        .outerjoin(Show, show_foreign_key == model.id) \
+        .outerjoin(other_model, other_model.id == other_foreign_key) \
+        .filter(model.id == entity_id) \
+        .group_by(model.id) \
+        .first()
+    if row is None:
+        return None
+    last_modified = max(i for i in row[:4] if i is not None)
+    # the show count covers deleted shows, which leave no newer timestamp behind
+    return f'{model.__tablename__}-{entity_id}-{last_modified.isoformat()}-{row[4]}', last_modified
+
+
+def query_shows_page(after, before, limit):
+    # keyset pagination on (start_time, id), walking backwards from the cursor when paging to earlier shows
+    query = db.session.query(Show.id, Show.start_time, Venue.id.label('venue_id'), Venue.name.label('venue_name'),
+                             Artist.id.label('artist_id'), Artist.name.label('artist_name'),
+                             Artist.image_link.label('artist_image_link')) \
+        .join(Venue, Venue.id == Show.venue_id) \
+        .join(Artist, Artist.id == Show.artist_id)
+    if before:
+        query = query.filter(tuple_(Show.start_time, Show.id) < before) \
+            .order_by(Show.start_time.desc(), Show.id.desc())
+    else:
+        if after:
+            query = query.filter(tuple_(Show.start_time, Show.id) > after)
+        query = query.order_by(Show.start_time, Show.id)
+    return query.limit(limit)
+
+
+def paginate_shows(rows, after, before, page_size, pagination):
+    # yields the shows of the page and fills in the pager cursors once they are all out, the pager comes after
+    # the shows in the template
+    has_more = False
+    if before:
+        # walked backwards, so the at most page_size + 1 rows are reversed in memory
+        rows = list(rows)
+        has_more = len(rows) > page_size
+        rows = reversed(rows[:page_size])
+    first = last = None
+    for count, i in enumerate(rows):
+        if count == page_size:
+            has_more = True
+            break
+        if first is None:
+            first = i
+        last = i
+        yield i
+    if first is not None:
+        pagination["prev"] = show_cursor(first) if after or (before and has_more) else None
+        pagination["next"] = show_cursor(last) if before or has_more else None
+
+
+def show_cursor(show):
+    return f'{show.start_time.isoformat()}_{show.id}'
+
+
+def parse_show_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        start_time, show_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(start_time), int(show_id)
+    except ValueError:
+        abort(400)
+
+
+def listing_rows(query):
+    # a server side cursor fetching STREAM_BATCH_SIZE rows at a time when listings are streamed
+    if app.config['STREAM_LISTINGS']:
+        return query.yield_per(app.config['STREAM_BATCH_SIZE'])
+    return query.all()
+
+
+def render_listing(template_name, **context):
+    # streamed listings send the head of the page right away and render the rows as they come from the cursor,
+    # in constant memory, instead of building the whole page first
+    if not app.config['STREAM_LISTINGS']:
+        return render_template(template_name, **context)
+    # the session cookie goes out with the headers, so a new session's CSRF token has to exist by then
+    generate_csrf()
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template(template_name).stream(context)
+    stream.enable_buffering()
+    return Response(stream_with_context(stream))
+
+
+def split_past_and_upcoming_shows(rows, map_show):
+    now = datetime.utcnow()
+    past_shows = []
+    upcoming_shows = []
+    for i in rows:
+        if i.start_time is None:
+            continue
+        if i.start_time <= now:
+            past_shows.append(map_show(i))
+        else:
+            upcoming_shows.append(map_show(i))
+    return past_shows, upcoming_shows
+
+
+def expire_cached_page_at_next_show(rows, upcoming_shows):
+    # rows are ordered by start_time, so the upcoming shows are the last ones and the first of them
+    # is the next show to move from upcoming to past
+    if upcoming_shows:
+        response_cache.expire_at(rows[len(rows) - len(upcoming_shows)].start_time)
+
 
 # ----------------------------------------------------------------------------#
 # Launch.
@@ -0,0 +1,164 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import request, abort, send_file, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST_NAME = 'manifest.json'
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.map', '.json', '.svg', '.eot', '.otf', '.ttf', '.txt', '.html'}
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+def build_assets(static_dir, assets_dir, use_brotli=True):
+    """Copies every file of static_dir to assets_dir under a name holding a hash of its content, next to gzip and,
+    when the brotli package is installed, brotli compressed variants of text files, and writes the manifest mapping
+    the original paths to them.
+
+    Files of earlier builds are left in place so that pages rendered before a deploy keep working. Returns the
+    manifest.
+    """
+    os.makedirs(assets_dir, exist_ok=True)
+    paths = []
+    for directory, _, file_names in os.walk(static_dir):
+        for file_name in file_names:
+            path = os.path.relpath(os.path.join(directory, file_name), static_dir).replace(os.sep, '/')
+            if not file_name.startswith('.'):
+                paths.append(path)
+    # stylesheets last, their url() references are rewritten to the hashed names of the files already built
+    paths.sort(key=lambda path: (path.endswith('.css'), path))
+    files = {}
+    for path in paths:
+        with open(os.path.join(static_dir, path), 'rb') as file:
+            content = file.read()
+        if path.endswith('.css'):
+            content = rewrite_css_urls(path, content.decode('utf-8'), files).encode('utf-8')
+        files[path] = write_asset(assets_dir, path, content, use_brotli and brotli is not None)
+    # hashed names of earlier builds stay servable, see above
+    hashed_files = load_manifest(assets_dir)['hashed_files']
+    hashed_files.update((asset['path'], asset) for asset in files.values())
+    manifest = {'files': files, 'hashed_files': hashed_files}
+    with open(os.path.join(assets_dir, MANIFEST_NAME), 'w') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(assets_dir):
+    try:
+        with open(os.path.join(assets_dir, MANIFEST_NAME)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {'files': {}, 'hashed_files': {}}
+
+
+def write_asset(assets_dir, path, content, use_brotli):
+    digest = hashlib.sha256(content).hexdigest()[:16]
+    stem, extension = posixpath.splitext(path)
+    hashed_path = f'{stem}.{digest}{extension}'
+    variants = {'identity': content}
+    if extension.lower() in COMPRESSIBLE_EXTENSIONS:
+        # mtime=0 keeps the gzip output, like the file name, a function of the content alone
+        variants['gzip'] = gzip.compress(content, 9, mtime=0)
+        if use_brotli:
+            variants['br'] = brotli.compress(content)
+    # a variant is only worth serving when it is smaller
+    variants = {encoding: data for encoding, data in variants.items()
+                if encoding == 'identity' or len(data) < len(content)}
+    for encoding, data in variants.items():
+        file_name = os.path.join(assets_dir, variant_path(hashed_path, encoding))
+        if not os.path.exists(file_name):
+            os.makedirs(os.path.dirname(file_name), exist_ok=True)
+            with open(file_name, 'wb') as file:
+                file.write(data)
+    return {
+        'path': hashed_path,
+        'etag': digest,
+        'sizes': {encoding: len(data) for encoding, data in variants.items()}
+    }
+
+
+def variant_path(hashed_path, encoding):
+    return {'identity': hashed_path, 'gzip': hashed_path + '.gz', 'br': hashed_path + '.br'}[encoding]
+
+
+def rewrite_css_urls(css_path, css, files):
+    # relative references such as ../fonts/fontawesome-webfont.woff?v=4.2.0 point to the hashed copy instead
+    def replace(match):
+        quote, reference = match.groups()
+        if re.match(r'^(data:|[a-z]+:|/|#)', reference, re.IGNORECASE):
+            return match.group(0)
+        target, suffix = re.match(r'^([^?#]*)(.*)$', reference).groups()
+        asset = files.get(posixpath.normpath(posixpath.join(posixpath.dirname(css_path), target)))
+        if asset is None:
+            return match.group(0)
+        hashed_target = posixpath.join(posixpath.dirname(target), posixpath.basename(asset['path']))
+        return f'url({quote}{hashed_target}{suffix}{quote})'
+
+    return CSS_URL.sub(replace, css)
+
+
+class AssetPipeline:
+    """Serves the files built by build_assets() under /assets with far-future caching.
+
+    Templates link to static files with asset_url(path), which points to the hashed copy once `flask assets build`
+    has been run and to the plain static file otherwise. Hashed files never change, so they are sent with a year
+    long immutable Cache-Control and their content hash as ETag, picking the brotli or gzip variant the client
+    accepts.
+    """
+
+    def __init__(self, app=None):
+        self.files = {}
+        self.hashed_files = {}
+        self.assets_dir = None
+        self.max_age = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.assets_dir = app.config['ASSETS_DIR']
+        self.max_age = app.config.get('ASSETS_MAX_AGE', 31536000)
+        self.load_manifest()
+        app.extensions['assets'] = self
+        app.add_template_global(self.asset_url)
+        app.add_url_rule('/assets/<path:filename>', 'asset', self.send_asset)
+
+    def load_manifest(self):
+        manifest = load_manifest(self.assets_dir)
+        self.files = manifest['files']
+        self.hashed_files = manifest['hashed_files']
+
+    def asset_url(self, path):
+        asset = self.files.get(path)
+        if asset is None:
+            return url_for('static', filename=path)
+        return url_for('asset', filename=asset['path'])
+
+    def send_asset(self, filename):
+        asset = self.hashed_files.get(filename)
+        if asset is None:
+            abort(404)
+        encoding = self.accepted_encoding(asset)
+        response = send_file(os.path.join(self.assets_dir, variant_path(filename, encoding)),
+                             mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                             add_etags=False, cache_timeout=self.max_age)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = f'public, max-age={self.max_age}, immutable'
+        response.set_etag(asset['etag'] if encoding == 'identity' else f"{asset['etag']}-{encoding}")
+        return response.make_conditional(request)
+
+    @staticmethod
+    def accepted_encoding(asset):
+        for encoding in ('br', 'gzip'):
+            if encoding in asset['sizes'] and request.accept_encodings[encoding]:
+                return encoding
+        return 'identity'
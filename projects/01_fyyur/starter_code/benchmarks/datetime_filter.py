@@ -0,0 +1,50 @@
+"""Per-show cost of the `datetime` Jinja filter, before and after passing native datetimes through.
+
+Run from the starter_code directory: python benchmarks/datetime_filter.py
+"""
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import format_datetime  # noqa: E402
+
+SHOWS = 500
+REPEAT = 5
+
+
+def format_datetime_before(value, format_param='medium'):
+    # the filter as it was: every value went through strftime, dateutil and an uncompiled Babel pattern
+    date = dateutil.parser.parse(value)
+    if format_param == 'full':
+        format_param = "EEEE MMMM, d, y 'at' h:mma"
+    elif format_param == 'medium':
+        format_param = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format_param)
+
+
+def main():
+    start_times = [datetime(2021, 1, 1, 20) + timedelta(hours=i) for i in range(SHOWS)]
+
+    def before():
+        for start_time in start_times:
+            format_datetime_before(start_time.strftime("%m/%d/%Y, %H:%M:%S"), 'full')
+
+    def after():
+        for start_time in start_times:
+            format_datetime(start_time, 'full')
+
+    assert format_datetime_before(start_times[0].strftime("%m/%d/%Y, %H:%M:%S"), 'full') \
+        == format_datetime(start_times[0], 'full')
+    for name, function in (('before', before), ('after', after)):
+        best = min(timeit.repeat(function, number=1, repeat=REPEAT))
+        print(f'{name:>6}: {best / SHOWS * 1e6:7.1f} us per show ({SHOWS} shows, best of {REPEAT})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Build time, memory and lookup latency of the autocomplete name index at a million names.
+
+Run from the starter_code directory: python benchmarks/name_index.py
+"""
+import os
+import random
+import string
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from name_index import PrefixIndex  # noqa: E402
+
+NAMES = 1000000
+LOOKUPS = 100000
+INSERTS = 1000
+LIMIT = 10
+
+
+def random_name(rng):
+    words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(rng.randint(1, 4))]
+    return ' '.join(word.capitalize() for word in words)
+
+
+def percentile(values, fraction):
+    return sorted(values)[int(len(values) * fraction)]
+
+
+def main():
+    rng = random.Random(42)
+    entries = [('venue' if i % 4 == 0 else 'artist', i, random_name(rng)) for i in range(NAMES)]
+
+    started = time.perf_counter()
+    index = PrefixIndex.build(entries, memory_budget=float('inf'))
+    print(f'build: {time.perf_counter() - started:.2f} s for {NAMES} names')
+
+    # built again, tracing allocations slows the build down several times
+    del index
+    tracemalloc.start()
+    index = PrefixIndex.build(entries, memory_budget=float('inf'))
+    traced, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'memory: {index.size / 2 ** 20:.0f} MiB estimated, {traced / 2 ** 20:.0f} MiB traced, '
+          f'{peak / 2 ** 20:.0f} MiB peak while building')
+
+    for length in (1, 2, 3, 5):
+        prefixes = [entries[rng.randrange(NAMES)][2][:length] for _ in range(LOOKUPS)]
+        timings = []
+        for prefix in prefixes:
+            started = time.perf_counter()
+            index.search(prefix, LIMIT)
+            timings.append(time.perf_counter() - started)
+        print(f'search, {length} character prefix: {sum(timings) / LOOKUPS * 1e6:6.1f} us mean, '
+              f'{percentile(timings, 0.99) * 1e6:6.1f} us p99 (limit {LIMIT})')
+
+    started = time.perf_counter()
+    for i in range(INSERTS):
+        index.add('artist', NAMES + i, random_name(rng))
+    print(f'add: {(time.perf_counter() - started) / INSERTS * 1e6:.0f} us per name')
+
+
+if __name__ == '__main__':
+    main()
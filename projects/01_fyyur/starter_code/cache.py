@@ -0,0 +1,277 @@
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+from functools import wraps
+
+from flask import request, g, session, make_response, current_app
+from flask_wtf.csrf import generate_csrf
+from werkzeug.http import is_resource_modified
+
+from import_stamp import last_import
+
+# Rendered pages embed the per-session CSRF token of the search form, so pages are cached with this placeholder
+# and the current session's token is put back in on every response.
+CSRF_TOKEN_PLACEHOLDER = '__response_cache_csrf_token__'
+
+
+class MemoryCacheBackend:
+    """In-process LRU of rendered responses, bounded by number of entries."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path, variant):
+        with self.lock:
+            entry = self.entries.get((path, variant))
+            if entry is not None:
+                self.entries.move_to_end((path, variant))
+            return entry
+
+    def set(self, path, variant, entry):
+        # returns the number of entries evicted to stay within max_entries, None when the entry was not stored
+        with self.lock:
+            self.entries[(path, variant)] = entry
+            self.entries.move_to_end((path, variant))
+            evicted = 0
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def delete(self, path):
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == path]:
+                del self.entries[key]
+
+
+class FileCacheBackend:
+    """Rendered responses pickled to a local directory, shared by all worker processes on the host.
+
+    Entries of one path live in a directory of their own so a path can be invalidated with a single rmtree, and the
+    file modification time doubles as the LRU clock.
+    """
+
+    def __init__(self, max_entries, directory):
+        self.max_entries = max_entries
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, path, variant):
+        file_name = self._file_name(path, variant)
+        try:
+            with open(file_name, 'rb') as file:
+                entry = pickle.load(file)
+            os.utime(file_name)
+            return entry
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def set(self, path, variant, entry):
+        file_name = self._file_name(path, variant)
+        # written to a temporary file first so that concurrent readers never see a partial entry
+        fd, temp_name = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                pickle.dump(entry, file, pickle.HIGHEST_PROTOCOL)
+            os.makedirs(os.path.dirname(file_name), exist_ok=True)
+            os.replace(temp_name, file_name)
+        except OSError:
+            # the path was invalidated in between and its directory removed, the entry is simply not stored
+            try:
+                os.remove(temp_name)
+            except OSError:
+                pass
+            return None
+        return self._evict()
+
+    def delete(self, path):
+        shutil.rmtree(self._path_directory(path), ignore_errors=True)
+
+    def _evict(self):
+        # directories and files may be removed by invalidations running meanwhile
+        files = []
+        for directory in os.scandir(self.directory):
+            if directory.is_dir():
+                try:
+                    files.extend((file.stat().st_mtime, file.path) for file in os.scandir(directory.path))
+                except FileNotFoundError:
+                    pass
+        excess = len(files) - self.max_entries
+        if excess <= 0:
+            return 0
+        files.sort()
+        for _, file_name in files[:excess]:
+            try:
+                os.remove(file_name)
+            except OSError:
+                pass
+        return excess
+
+    def _path_directory(self, path):
+        return os.path.join(self.directory, hashlib.sha1(path.encode()).hexdigest())
+
+    def _file_name(self, path, variant):
+        return os.path.join(self._path_directory(path), hashlib.sha1(variant.encode()).hexdigest())
+
+
+class ResponseCache:
+    """Caches rendered GET responses per path and query string.
+
+    Entries expire after RESPONSE_CACHE_TTL seconds, or earlier when the view calls expire_at() because its output
+    changes at a known time, and are dropped by invalidate() when the data behind a path is written. Entries stored
+    before the last bulk import, which runs in a process of its own, are ignored in every worker.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = 0
+        self.import_stamp_file = None
+        self.lock = threading.Lock()
+        self.counters = dict.fromkeys(('hits', 'misses', 'stores', 'evictions', 'invalidations', 'bypasses'), 0)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('RESPONSE_CACHE_BACKEND')
+        max_entries = app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 500)
+        if backend == 'memory':
+            self.backend = MemoryCacheBackend(max_entries)
+        elif backend == 'file':
+            self.backend = FileCacheBackend(max_entries, app.config['RESPONSE_CACHE_DIR'])
+        elif backend:
+            raise ValueError(f'Unknown RESPONSE_CACHE_BACKEND {backend!r}')
+        self.ttl = app.config.get('RESPONSE_CACHE_TTL', 60)
+        self.import_stamp_file = app.config.get('IMPORT_STAMP_FILE')
+        app.extensions['response_cache'] = self
+
+        @app.context_processor
+        def csrf_token_placeholder():
+            # decided when the token is rendered, streamed pages render after the view has returned
+            return {'csrf_token': lambda: CSRF_TOKEN_PLACEHOLDER if g.get('response_cache_render') else generate_csrf()}
+
+    def cached(self, view):
+        @wraps(view)
+        def decorated_view(*args, **kwargs):
+            # pages showing flashed messages are personal, as is anything but a plain GET
+            if self.backend is None or request.method != 'GET' or session.get('_flashes'):
+                self._count('bypasses')
+                return view(*args, **kwargs)
+            variant = request.query_string.decode()
+            entry = self.backend.get(request.path, variant)
+            if entry is not None and entry['expires_at'] > time.time() and not self._stored_before_import(entry):
+                self._count('hits')
+                return self._response(entry, 'HIT')
+            self._count('misses')
+            g.response_cache_render = True
+            g.response_cache_expires_at = time.time() + self.ttl
+            try:
+                response = make_response(view(*args, **kwargs))
+            finally:
+                g.response_cache_render = False
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            entry = {
+                'body': response.get_data(),
+                'mimetype': response.mimetype,
+                'expires_at': g.response_cache_expires_at,
+                'stored_at': time.time()
+            }
+            evicted = self.backend.set(request.path, variant, entry)
+            if evicted is not None:
+                self._count('stores')
+                self._count('evictions', evicted)
+            return self._response(entry, 'MISS')
+
+        return decorated_view
+
+    def expire_at(self, date_time):
+        # lets a view whose output changes at a known (naive UTC) time, e.g. when a show starts, expire its entry then
+        if g.get('response_cache_render'):
+            timestamp = date_time.replace(tzinfo=timezone.utc).timestamp()
+            g.response_cache_expires_at = min(g.response_cache_expires_at, timestamp)
+
+    def invalidate(self, *paths):
+        if self.backend is None:
+            return
+        for path in paths:
+            self.backend.delete(path)
+        self._count('invalidations', len(paths))
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else None
+        stats['backend'] = type(self.backend).__name__ if self.backend else None
+        return stats
+
+    def _stored_before_import(self, entry):
+        return self.import_stamp_file is not None \
+            and entry.get('stored_at', 0) <= last_import(self.import_stamp_file)
+
+    def _count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    @staticmethod
+    def _response(entry, status):
+        body = entry['body'].replace(CSRF_TOKEN_PLACEHOLDER.encode(), generate_csrf().encode())
+        response = make_response(body)
+        response.mimetype = entry['mimetype']
+        response.headers['X-Cache'] = status
+        return response
+
+
+def conditional(validator):
+    """Answers conditional GETs of a view with 304 Not Modified without calling it.
+
+    validator is called with the view's arguments and returns an (etag, last_modified) pair from a query far cheaper
+    than the page, or None when there is nothing to validate (the view then runs as usual, e.g. to render a 404).
+    Pages embed the session's CSRF token, so the ETag also covers the token and its signing window and only
+    If-None-Match is answered. Responses are `private, no-cache` and vary on the cookie, so browsers revalidate
+    every time and never reuse another session's page.
+    """
+    def decorator(view):
+        @wraps(view)
+        def decorated_view(*args, **kwargs):
+            validators = validator(*args, **kwargs) if request.method == 'GET' else None
+            if validators is None:
+                return view(*args, **kwargs)
+            etag, last_modified = validators
+            etag = f'{etag}-{csrf_token_version()}'
+            if is_resource_modified(request.environ, etag=etag):
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            else:
+                response = make_response('', 304)
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            response.vary.add('Cookie')
+            return response
+
+        return decorated_view
+
+    return decorator
+
+
+def csrf_token_version():
+    # changes with the session's CSRF token and, half way through WTF_CSRF_TIME_LIMIT, with the signed token the
+    # page embeds, so a page revalidated by ETag never carries an expired token
+    generate_csrf()
+    token = session[current_app.config.get('WTF_CSRF_FIELD_NAME', 'csrf_token')]
+    version = hashlib.sha1(token.encode()).hexdigest()[:16]
+    time_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    if time_limit:
+        version += f'-{int(time.time() // max(time_limit // 2, 1))}'
+    return version
@@ -0,0 +1,77 @@
+import json
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from assets import build_assets
+from counters import roll_over_show_counters
+from import_stamp import mark_import
+from importer import IMPORTS, read_records, import_records
+
+shows_cli = AppGroup('shows', help='Show maintenance commands.')
+
+
+@shows_cli.command('roll-over')
+def roll_over():
+    """Move shows that have started from the upcoming to the past counters. Run it periodically, e.g. from cron."""
+    synced_at = roll_over_show_counters()
+    click.echo(f'Show counters are up to date as of {synced_at}.')
+
+
+import_cli = AppGroup('import', help='Bulk import venues, artists and shows from CSV or JSON files.')
+
+
+def run_import(kind, file_name, chunk_size, rejects):
+    started = time.monotonic()
+
+    def on_progress(loaded, rejected):
+        rate = (loaded + rejected) / max(time.monotonic() - started, 1e-9)
+        click.echo(f'{kind}: {loaded} loaded, {rejected} rejected ({rate:.0f} rows/s)')
+
+    def on_reject(line, record, errors):
+        reject = json.dumps({'line': line, 'record': record, 'errors': errors}, default=str)
+        click.echo(reject, file=rejects, err=rejects is None)
+
+    try:
+        records = read_records(file_name)
+        loaded, rejected = import_records(kind, records, chunk_size, on_progress, on_reject)
+    except ValueError as error:
+        raise click.ClickException(str(error))
+    # imported rows are not covered by the create handlers' invalidation, the web workers are told through the stamp
+    mark_import(current_app.config['IMPORT_STAMP_FILE'])
+    click.echo(f'Imported {loaded} {kind} in {time.monotonic() - started:.1f}s, rejected {rejected}.')
+
+
+def import_command(kind):
+    @import_cli.command(kind, help=f'Import {kind} from FILE (.csv, .jsonl, .ndjson or a .json array). Rows are '
+                                   f'validated like the create {kind[:-1]} form and loaded in chunks with COPY.')
+    @click.argument('file_name', metavar='FILE', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--chunk-size', default=5000, show_default=True, help='Rows validated and loaded per transaction.')
+    @click.option('--rejects', type=click.File('w'), help='Write rejected rows to this file as JSON lines '
+                                                          'instead of stderr.')
+    def command(file_name, chunk_size, rejects):
+        run_import(kind, file_name, chunk_size, rejects)
+
+    return command
+
+
+for import_kind in IMPORTS:
+    import_command(import_kind)
+
+
+assets_cli = AppGroup('assets', help='Static asset commands.')
+
+
+@assets_cli.command('build')
+def build():
+    """Build content hashed, precompressed copies of the static files. Run it on every deploy."""
+    manifest = build_assets(current_app.static_folder, current_app.config['ASSETS_DIR'],
+                            current_app.config['ASSETS_BROTLI'])
+    current_app.extensions['assets'].load_manifest()
+    sizes = [asset['sizes'] for asset in manifest['files'].values()]
+    original = sum(size['identity'] for size in sizes)
+    compressed = sum(min(size.values()) for size in sizes)
+    click.echo(f'Built {len(sizes)} assets in {current_app.config["ASSETS_DIR"]}, '
+               f'{original} bytes, {compressed} bytes compressed.')
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from sqlalchemy import bindparam, func
+
+from models import db, Venue, Artist, Show, ShowCounters
+
+
+def lock_show_counters(exclusive=False):
+    # Shows starting after synced_at are counted as upcoming, the others as past. Show writers share the lock
+    # and the roll over takes it exclusively, so no show is ever moved twice or missed by a roll over.
+    return db.session.query(ShowCounters.synced_at) \
+        .filter(ShowCounters.id == ShowCounters.SINGLETON_ID) \
+        .with_for_update(read=not exclusive) \
+        .scalar()
+
+
+def add_shows_to_counters(shows, synced_at):
+    # shows are (venue_id, artist_id, start_time) tuples, applied with one batched UPDATE per table
+    for model, key in ((Venue, 0), (Artist, 1)):
+        counts = {}
+        for show in shows:
+            upcoming, past = counts.get(int(show[key]), (0, 0))
+            if show[2] > synced_at:
+                upcoming += 1
+            else:
+                past += 1
+            counts[int(show[key])] = upcoming, past
+        if not counts:
+            continue
+        table = model.__table__
+        statement = table.update() \
+            .where(table.c.id == bindparam('entity_id')) \
+            .values(upcoming_shows_count=table.c.upcoming_shows_count + bindparam('upcoming'),
+                    past_shows_count=table.c.past_shows_count + bindparam('past'))
+        # sorted ids keep the row lock order stable across concurrent writers
+        db.session.execute(statement, [{'entity_id': entity_id, 'upcoming': upcoming, 'past': past}
+                                       for entity_id, (upcoming, past) in sorted(counts.items())])
+
+
+def roll_over_show_counters(now=None):
+    # moves shows that started since the last roll over from the upcoming to the past counters
+    now = now or datetime.utcnow()
+    synced_at = lock_show_counters(exclusive=True)
+    if now <= synced_at:
+        db.session.rollback()
+        return synced_at
+    for model, foreign_key in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        started = db.session.query(foreign_key.label('entity_id'), func.count(Show.id).label('started')) \
+            .filter(Show.start_time > synced_at, Show.start_time <= now) \
+            .group_by(foreign_key) \
+            .subquery()
+        table = model.__table__
+        db.session.execute(table.update()
+                           .where(table.c.id == started.c.entity_id)
+                           .values(upcoming_shows_count=table.c.upcoming_shows_count - started.c.started,
+                                   past_shows_count=table.c.past_shows_count + started.c.started))
+    db.session.query(ShowCounters) \
+        .filter(ShowCounters.id == ShowCounters.SINGLETON_ID) \
+        .update({ShowCounters.synced_at: now}, synchronize_session=False)
+    db.session.commit()
+    return now
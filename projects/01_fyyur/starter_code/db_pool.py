@@ -0,0 +1,97 @@
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, NullPool
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a free connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_lock = threading.Lock()
+        self.wait_stats = {'checkouts': 0, 'waits': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0, 'timeouts': 0}
+
+    def _do_get(self):
+        # only checkouts finding no idle connection and no overflow left have to queue, the time the others
+        # take is spent connecting, not waiting
+        exhausted = self.checkedin() == 0 and self._max_overflow > -1 and self.overflow() >= self._max_overflow
+        started = time.monotonic()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self.wait_lock:
+                self.wait_stats['timeouts'] += 1
+            raise
+        finally:
+            waited = time.monotonic() - started
+            with self.wait_lock:
+                self.wait_stats['checkouts'] += 1
+                if exhausted:
+                    self.wait_stats['waits'] += 1
+                    self.wait_stats['wait_seconds'] += waited
+                    self.wait_stats['max_wait_seconds'] = max(self.wait_stats['max_wait_seconds'], waited)
+
+    def recreate(self):
+        # the pool is recreated when connections are invalidated, keep counting on the same numbers
+        pool = super().recreate()
+        pool.wait_lock = self.wait_lock
+        pool.wait_stats = self.wait_stats
+        return pool
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS built from the DB_POOL_* and DB_* settings in config.py."""
+    if config['DB_PGBOUNCER']:
+        # PgBouncer in transaction mode does the pooling and rejects startup options, so every checkout gets a
+        # fresh client connection to PgBouncer and the statement timeout is set per transaction instead
+        return {'poolclass': NullPool}
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING']
+    }
+    if config['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+    return options
+
+
+def init_db_pool(app, db):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    db.init_app(app)
+
+    if app.config['DB_PGBOUNCER'] and app.config['DB_STATEMENT_TIMEOUT_MS']:
+        with app.app_context():
+            @event.listens_for(db.engine, 'begin')
+            def set_statement_timeout(connection):
+                connection.execute(f"SET LOCAL statement_timeout = {int(app.config['DB_STATEMENT_TIMEOUT_MS'])}")
+
+    @app.after_request
+    def release_connection(response):
+        # hand the connection back to the pool as soon as the view is done instead of after the response is sent,
+        # streamed responses still need it and release it on teardown
+        if not response.is_streamed:
+            db.session.close()
+        return response
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        with pool.wait_lock:
+            stats.update(pool.wait_stats)
+        stats['avg_wait_seconds'] = stats['wait_seconds'] / stats['waits'] if stats['waits'] else 0.0
+    return stats
@@ -1,10 +1,14 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import phonenumbers
 from flask_wtf import FlaskForm
 from phonenumbers import NumberParseException
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, TextAreaField, SubmitField
-from wtforms.validators import DataRequired, URL, ValidationError, Optional
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, TextAreaField, SubmitField, \
+    IntegerField
+from wtforms.validators import DataRequired, URL, ValidationError, Optional, NumberRange
+
+# longest show in minutes, also the longest span /shows/availability checks
+MAX_SHOW_DURATION = 24 * 60
 
 
 def validate_phone(self, field):
@@ -107,8 +111,21 @@ class ShowForm(FlaskForm):
         validators=[DataRequired()],
         default=datetime.today()
     )
+    duration = IntegerField(
+        'Duration (minutes)',
+        validators=[Optional(), NumberRange(min=1, max=MAX_SHOW_DURATION)],
+        default=120
+    )
     submit = SubmitField('Create Show')
 
+    def model_values(self):
+        return {
+            'artist_id': self.artist_id.data,
+            'venue_id': self.venue_id.data,
+            'start_time': self.start_time.data,
+            'end_time': self.start_time.data + timedelta(minutes=self.duration.data or 120)
+        }
+
 
 class VenueForm(FlaskForm):
     name = StringField(
@@ -145,6 +162,22 @@ class VenueForm(FlaskForm):
     )
     submit = SubmitField('Create Venue')
 
+    def model_values(self):
+        return {
+            'name': self.name.data,
+            'city': self.city.data,
+            'state': self.state.data,
+            'address': self.address.data,
+            'phone': self.phone.data,
+            'image_link': self.image_link.data if self.image_link.data else None,
+            'facebook_link': self.facebook_link.data if self.facebook_link.data else None,
+            'genres': self.genres.data,
+            'website': self.website.data if self.website.data else None,
+            'seeking_talent': True if self.seeking_talent_description.data else False,
+            'seeking_description': self.seeking_talent_description.data
+            if self.seeking_talent_description.data else None
+        }
+
 
 class ArtistForm(FlaskForm):
     name = StringField(
@@ -177,3 +210,18 @@ class ArtistForm(FlaskForm):
         'Message for Venues'
     )
     submit = SubmitField('Create Artist')
+
+    def model_values(self):
+        return {
+            'name': self.name.data,
+            'city': self.city.data,
+            'state': self.state.data,
+            'phone': self.phone.data,
+            'image_link': self.image_link.data if self.image_link.data else None,
+            'facebook_link': self.facebook_link.data if self.facebook_link.data else None,
+            'genres': self.genres.data,
+            'website': self.website.data if self.website.data else None,
+            'seeking_venue': True if self.seeking_venue_description.data else False,
+            'seeking_description': self.seeking_venue_description.data
+            if self.seeking_venue_description.data else None
+        }
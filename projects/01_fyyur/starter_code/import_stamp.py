@@ -0,0 +1,17 @@
+import os
+
+
+def mark_import(file_name):
+    # touched by the import commands, which run in a process of their own, so that web workers notice the import
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    with open(file_name, 'a'):
+        pass
+    os.utime(file_name)
+
+
+def last_import(file_name):
+    # time of the last finished import, 0 before the first one
+    try:
+        return os.stat(file_name).st_mtime
+    except FileNotFoundError:
+        return 0
@@ -0,0 +1,235 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from itertools import islice
+
+from psycopg2 import Error as DatabaseError
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from werkzeug.datastructures import MultiDict
+
+from counters import lock_show_counters, add_shows_to_counters
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Venue, Artist, Show
+
+DOUBLE_BOOKED = 'The venue or artist already has a show at that time.'
+
+# rows of the chunk overlapping a show of the same venue or artist already in the database
+OVERLAPPING_ROWS = text('''
+    SELECT DISTINCT candidates.line
+    FROM unnest(:lines, :venue_ids, :artist_ids, :start_times, :end_times)
+        AS candidates (line, venue_id, artist_id, start_time, end_time)
+    JOIN shows ON (shows.venue_id = candidates.venue_id OR shows.artist_id = candidates.artist_id)
+        AND tsrange(shows.start_time, shows.end_time) && tsrange(candidates.start_time, candidates.end_time)
+''')
+
+IMPORTS = {
+    'venues': (VenueForm, Venue),
+    'artists': (ArtistForm, Artist),
+    'shows': (ShowForm, Show)
+}
+
+
+def read_records(file_name):
+    # CSV and JSON lines files are streamed, a plain JSON file must hold one array and is read whole
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension not in ('.csv', '.jsonl', '.ndjson', '.json'):
+        raise ValueError(f'Unsupported file type {extension!r}, expected .csv, .jsonl, .ndjson or .json')
+    with open(file_name, newline='', encoding='utf-8') as file:
+        if extension == '.csv':
+            yield from csv.DictReader(file)
+        elif extension == '.json':
+            yield from json.load(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def import_records(kind, records, chunk_size, on_progress, on_reject):
+    """Validates records with the form of the given kind and loads the valid ones with COPY, one transaction per chunk.
+
+    on_reject(line, record, errors) is called for every invalid record and on_progress(loaded, rejected) after every
+    chunk. A chunk the database still refuses is rolled back and all its rows are rejected with the database's error.
+    Returns the totals of loaded and rejected records.
+    """
+    form_class, model = IMPORTS[kind]
+    loaded = rejected = 0
+    numbered_records = enumerate(records, 1)
+    while True:
+        chunk = list(islice(numbered_records, chunk_size))
+        if not chunk:
+            break
+        rows = []
+        for line, record in chunk:
+            form = form_class(formdata=to_formdata(record), meta={'csrf': False})
+            if form.validate():
+                rows.append((line, record, form.model_values()))
+            else:
+                on_reject(line, record, form.errors)
+                rejected += 1
+        rows, invalid_rows = check_lengths(model, rows)
+        if kind == 'shows':
+            rows, invalid_references = check_show_references(rows)
+            rows, overlapping_rows = check_show_overlaps(rows)
+            invalid_rows += invalid_references + overlapping_rows
+        for line, record, errors in invalid_rows:
+            on_reject(line, record, errors)
+        rejected += len(invalid_rows)
+        try:
+            if kind == 'shows':
+                load_shows([values for _, _, values in rows])
+            else:
+                copy_rows(model.__tablename__, [values for _, _, values in rows])
+            db.session.commit()
+            loaded += len(rows)
+        except (DatabaseError, DBAPIError) as error:
+            db.session.rollback()
+            message = str(getattr(error, 'orig', error)).strip()
+            for line, record, _ in rows:
+                on_reject(line, record, {'chunk': [message]})
+            rejected += len(rows)
+        on_progress(loaded, rejected)
+    return loaded, rejected
+
+
+def to_formdata(record):
+    formdata = MultiDict()
+    for key, value in record.items():
+        if key == 'genres' and isinstance(value, str):
+            value = [genre.strip() for genre in value.split(',') if genre.strip()]
+        if isinstance(value, list):
+            for item in value:
+                formdata.add(key, str(item))
+        elif value is not None:
+            formdata.add(key, str(value))
+    return formdata
+
+
+def check_lengths(model, rows):
+    # the forms don't limit lengths, a value longer than its column would fail the whole chunk's COPY
+    lengths = {}
+    for column in model.__table__.columns:
+        column_type = getattr(column.type, 'item_type', column.type)
+        if getattr(column_type, 'length', None):
+            lengths[column.name] = column_type.length
+    valid_rows = []
+    invalid_rows = []
+    for line, record, values in rows:
+        errors = {}
+        for key, length in lengths.items():
+            value = values.get(key)
+            items = value if isinstance(value, list) else [value]
+            if any(isinstance(item, str) and len(item) > length for item in items):
+                errors[key] = [f'Longer than {length} characters.']
+        if errors:
+            invalid_rows.append((line, record, errors))
+        else:
+            valid_rows.append((line, record, values))
+    return valid_rows, invalid_rows
+
+
+def check_show_references(rows):
+    # the form only checks that ids are present, so unknown venues and artists are rejected here instead of
+    # failing the whole chunk on a foreign key violation
+    numeric_rows = []
+    invalid_rows = []
+    for line, record, values in rows:
+        errors = {}
+        for key in ('venue_id', 'artist_id'):
+            try:
+                values[key] = int(values[key])
+            except ValueError:
+                errors[key] = ['Not a valid id.']
+        if errors:
+            invalid_rows.append((line, record, errors))
+        else:
+            numeric_rows.append((line, record, values))
+    venue_ids = existing_ids(Venue, {values['venue_id'] for _, _, values in numeric_rows})
+    artist_ids = existing_ids(Artist, {values['artist_id'] for _, _, values in numeric_rows})
+    valid_rows = []
+    for line, record, values in numeric_rows:
+        errors = {}
+        if values['venue_id'] not in venue_ids:
+            errors['venue_id'] = ['No venue with this id.']
+        if values['artist_id'] not in artist_ids:
+            errors['artist_id'] = ['No artist with this id.']
+        if errors:
+            invalid_rows.append((line, record, errors))
+        else:
+            valid_rows.append((line, record, values))
+    return valid_rows, invalid_rows
+
+
+def check_show_overlaps(rows):
+    # rows double booking a venue or artist would fail the whole chunk's COPY on the no overlap constraints, so
+    # they are rejected here, both against the shows in the database and against the other rows of the chunk
+    if not rows:
+        return rows, []
+    chunk_values = [values for _, _, values in rows]
+    overlapping_lines = {line for (line,) in db.session.execute(OVERLAPPING_ROWS, {
+        'lines': [line for line, _, _ in rows],
+        'venue_ids': [i['venue_id'] for i in chunk_values],
+        'artist_ids': [i['artist_id'] for i in chunk_values],
+        'start_times': [i['start_time'] for i in chunk_values],
+        'end_times': [i['end_time'] for i in chunk_values]
+    })}
+    # in start time order a row overlaps an earlier one of its venue or artist exactly when it starts before the
+    # latest end among them
+    latest_end_times = {}
+    valid_rows = []
+    invalid_rows = []
+    for line, record, values in sorted(rows, key=lambda row: (row[2]['start_time'], row[0])):
+        owners = (('venue_id', values['venue_id']), ('artist_id', values['artist_id']))
+        if line in overlapping_lines or any(owner in latest_end_times and values['start_time'] < latest_end_times[owner]
+                                            for owner in owners):
+            invalid_rows.append((line, record, {'start_time': [DOUBLE_BOOKED]}))
+            continue
+        for owner in owners:
+            latest_end_times[owner] = max(latest_end_times.get(owner, values['end_time']), values['end_time'])
+        valid_rows.append((line, record, values))
+    valid_rows.sort(key=lambda row: row[0])
+    invalid_rows.sort(key=lambda row: row[0])
+    return valid_rows, invalid_rows
+
+
+def existing_ids(model, ids):
+    if not ids:
+        return set()
+    return {i for (i,) in db.session.query(model.id).filter(model.id.in_(ids))}
+
+
+def load_shows(rows):
+    # the counters lock is taken before the shows are written, like create_show_submission does
+    synced_at = lock_show_counters()
+    copy_rows(Show.__tablename__, rows)
+    add_shows_to_counters([(row['venue_id'], row['artist_id'], row['start_time']) for row in rows], synced_at)
+
+
+def copy_rows(table, rows):
+    # rows are dicts of column values as returned by the forms' model_values()
+    if not rows:
+        return
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(copy_value(row[column]) for column in columns))
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert(f'COPY {table} ({", ".join(columns)}) FROM STDIN', buffer)
+
+
+def copy_value(value):
+    # a field of COPY's text format
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat(' ')
+    if isinstance(value, list):
+        value = '{' + ','.join('"' + str(item).replace('\\', '\\\\').replace('"', '\\"') + '"' for item in value) + '}'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
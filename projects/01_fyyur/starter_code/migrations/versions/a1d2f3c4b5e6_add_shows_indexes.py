@@ -0,0 +1,34 @@
+"""add shows indexes
+
+Revision ID: a1d2f3c4b5e6
+Revises: 325112178948
+Create Date: 2026-10-18 10:12:41.532918
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1d2f3c4b5e6'
+down_revision = '325112178948'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, so these run in autocommit mode
+    # and do not block writes to shows while they are built
+    with op.get_context().autocommit_block():
+        op.create_index('ix_shows_venue_id_start_time', 'shows', ['venue_id', 'start_time'], unique=False,
+                        postgresql_concurrently=True)
+        op.create_index('ix_shows_artist_id_start_time', 'shows', ['artist_id', 'start_time'], unique=False,
+                        postgresql_concurrently=True)
+        op.create_index('ix_shows_start_time_id', 'shows', ['start_time', 'id'], unique=False,
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_shows_start_time_id', table_name='shows', postgresql_concurrently=True)
+        op.drop_index('ix_shows_artist_id_start_time', table_name='shows', postgresql_concurrently=True)
+        op.drop_index('ix_shows_venue_id_start_time', table_name='shows', postgresql_concurrently=True)
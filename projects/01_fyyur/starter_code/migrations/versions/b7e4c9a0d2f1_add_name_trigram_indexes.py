@@ -0,0 +1,33 @@
+"""add name trigram indexes
+
+Revision ID: b7e4c9a0d2f1
+Revises: a1d2f3c4b5e6
+Create Date: 2026-10-18 11:03:27.118204
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e4c9a0d2f1'
+down_revision = 'a1d2f3c4b5e6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # trigram GIN indexes let ILIKE '%term%' searches on name skip the sequential scan
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venues_name_trgm', 'venues', ['name'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+                        postgresql_concurrently=True)
+        op.create_index('ix_artists_name_trgm', 'artists', ['name'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_artists_name_trgm', table_name='artists', postgresql_concurrently=True)
+        op.drop_index('ix_venues_name_trgm', table_name='venues', postgresql_concurrently=True)
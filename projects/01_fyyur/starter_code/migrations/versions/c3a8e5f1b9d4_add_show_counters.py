@@ -0,0 +1,52 @@
+"""add show counters
+
+Revision ID: c3a8e5f1b9d4
+Revises: b7e4c9a0d2f1
+Create Date: 2026-10-18 11:48:05.640371
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a8e5f1b9d4'
+down_revision = 'b7e4c9a0d2f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('show_counters',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('synced_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.add_column('venues', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('venues', sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('artists', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('artists', sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+    # the application stores naive UTC times, so the counters start in sync as of the current UTC time
+    op.execute("INSERT INTO show_counters (id, synced_at) VALUES (1, timezone('utc', now()))")
+    for table, foreign_key in (('venues', 'venue_id'), ('artists', 'artist_id')):
+        op.execute(f'''
+            UPDATE {table}
+            SET upcoming_shows_count = counts.upcoming, past_shows_count = counts.past
+            FROM (
+                SELECT shows.{foreign_key} AS entity_id,
+                       count(*) FILTER (WHERE shows.start_time > show_counters.synced_at) AS upcoming,
+                       count(*) FILTER (WHERE shows.start_time <= show_counters.synced_at) AS past
+                FROM shows CROSS JOIN show_counters
+                GROUP BY shows.{foreign_key}
+            ) AS counts
+            WHERE {table}.id = counts.entity_id
+        ''')
+
+
+def downgrade():
+    op.drop_column('artists', 'past_shows_count')
+    op.drop_column('artists', 'upcoming_shows_count')
+    op.drop_column('venues', 'past_shows_count')
+    op.drop_column('venues', 'upcoming_shows_count')
+    op.drop_table('show_counters')
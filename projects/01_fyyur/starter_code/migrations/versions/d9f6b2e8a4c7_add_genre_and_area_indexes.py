@@ -0,0 +1,37 @@
+"""add genre and area indexes
+
+Revision ID: d9f6b2e8a4c7
+Revises: c3a8e5f1b9d4
+Create Date: 2026-10-18 13:20:52.904113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9f6b2e8a4c7'
+down_revision = 'c3a8e5f1b9d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # GIN indexes serve the genres @> filters, the (state, lower(city)) ones the area filters
+    with op.get_context().autocommit_block():
+        op.create_index('ix_venues_genres', 'venues', ['genres'], unique=False,
+                        postgresql_using='gin', postgresql_concurrently=True)
+        op.create_index('ix_artists_genres', 'artists', ['genres'], unique=False,
+                        postgresql_using='gin', postgresql_concurrently=True)
+        op.create_index('ix_venues_state_lower_city', 'venues', ['state', sa.text('lower(city)')], unique=False,
+                        postgresql_concurrently=True)
+        op.create_index('ix_artists_state_lower_city', 'artists', ['state', sa.text('lower(city)')], unique=False,
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_artists_state_lower_city', table_name='artists', postgresql_concurrently=True)
+        op.drop_index('ix_venues_state_lower_city', table_name='venues', postgresql_concurrently=True)
+        op.drop_index('ix_artists_genres', table_name='artists', postgresql_concurrently=True)
+        op.drop_index('ix_venues_genres', table_name='venues', postgresql_concurrently=True)
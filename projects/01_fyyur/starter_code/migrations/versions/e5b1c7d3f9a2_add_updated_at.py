@@ -0,0 +1,28 @@
+"""add updated_at
+
+Revision ID: e5b1c7d3f9a2
+Revises: d9f6b2e8a4c7
+Create Date: 2026-10-18 19:24:11.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b1c7d3f9a2'
+down_revision = 'd9f6b2e8a4c7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the default is stable rather than volatile, so existing rows get it without a table rewrite
+    for table in ('shows', 'venues', 'artists'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                       server_default=sa.text("timezone('utc', now())")))
+
+
+def downgrade():
+    for table in ('artists', 'venues', 'shows'):
+        op.drop_column(table, 'updated_at')
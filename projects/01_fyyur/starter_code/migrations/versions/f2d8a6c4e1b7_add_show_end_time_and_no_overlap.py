@@ -0,0 +1,46 @@
+"""add show end time and no overlap constraints
+
+Revision ID: f2d8a6c4e1b7
+Revises: e5b1c7d3f9a2
+Create Date: 2026-10-18 19:41:37.502864
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2d8a6c4e1b7'
+down_revision = 'e5b1c7d3f9a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # btree_gist provides the GiST operator class for the integer equality part of the constraints
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.add_column('shows', sa.Column('end_time', sa.DateTime(), nullable=True))
+    # existing shows last the default two hours, cut short where the venue or artist has a later show before
+    # that, so they satisfy the constraints below (a show starting together with another one ends up empty)
+    op.execute('''
+        UPDATE shows
+        SET end_time = least(shows.start_time + interval '2 hours', next.venue_start_time, next.artist_start_time)
+        FROM (
+            SELECT id,
+                   lead(start_time) OVER (PARTITION BY venue_id ORDER BY start_time, id) AS venue_start_time,
+                   lead(start_time) OVER (PARTITION BY artist_id ORDER BY start_time, id) AS artist_start_time
+            FROM shows
+        ) AS next
+        WHERE shows.id = next.id
+    ''')
+    op.alter_column('shows', 'end_time', nullable=False)
+    op.execute('ALTER TABLE shows ADD CONSTRAINT ex_shows_venue_id_during '
+               'EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)')
+    op.execute('ALTER TABLE shows ADD CONSTRAINT ex_shows_artist_id_during '
+               'EXCLUDE USING gist (artist_id WITH =, tsrange(start_time, end_time) WITH &&)')
+
+
+def downgrade():
+    op.drop_constraint('ex_shows_artist_id_during', 'shows')
+    op.drop_constraint('ex_shows_venue_id_during', 'shows')
+    op.drop_column('shows', 'end_time')
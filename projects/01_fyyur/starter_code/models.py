@@ -1,6 +1,9 @@
+from datetime import datetime
+
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
 
 app = Flask(__name__)
 db = SQLAlchemy()
@@ -9,11 +12,19 @@ Migrate(app, db)
 
 class Show(db.Model):
     __tablename__ = 'shows'
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=db.text("timezone('utc', now())"))
 
     def __repr__(self):
         return f'<Show {self.id}>'
@@ -21,6 +32,10 @@ class Show(db.Model):
 
 class Venue(db.Model):
     __tablename__ = 'venues'
+    __table_args__ = (
+        db.Index('ix_venues_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_venues_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, nullable=False)
     name = db.Column(db.String, nullable=False)
@@ -34,6 +49,10 @@ class Venue(db.Model):
     website = db.Column(db.String(120), nullable=True)
     seeking_talent = db.Column(db.Boolean, nullable=False)
     seeking_description = db.Column(db.String(500), nullable=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=db.text("timezone('utc', now())"))
     shows = db.relationship('Show', backref='venue')
 
     def __repr__(self):
@@ -42,6 +61,10 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'artists'
+    __table_args__ = (
+        db.Index('ix_artists_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_artists_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, nullable=False)
     name = db.Column(db.String, nullable=False)
@@ -54,7 +77,39 @@ class Artist(db.Model):
     website = db.Column(db.String(120), nullable=True)
     seeking_venue = db.Column(db.Boolean, nullable=False)
     seeking_description = db.Column(db.String(120), nullable=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=db.text("timezone('utc', now())"))
     shows = db.relationship('Show', backref='artist')
 
     def __repr__(self):
         return f'<Artist {self.id} {self.name}>'
+
+
+db.Index('ix_venues_state_lower_city', Venue.state, db.func.lower(Venue.city))
+db.Index('ix_artists_state_lower_city', Artist.state, db.func.lower(Artist.city))
+
+# a venue or artist can't have two shows at the same time, the GiST indexes behind these also serve
+# the availability lookup
+Show.__table__.append_constraint(ExcludeConstraint(
+    (Show.venue_id, '='), (db.func.tsrange(Show.start_time, Show.end_time), '&&'),
+    name='ex_shows_venue_id_during', using='gist'
+))
+Show.__table__.append_constraint(ExcludeConstraint(
+    (Show.artist_id, '='), (db.func.tsrange(Show.start_time, Show.end_time), '&&'),
+    name='ex_shows_artist_id_during', using='gist'
+))
+
+
+class ShowCounters(db.Model):
+    __tablename__ = 'show_counters'
+
+    # single row holding the time up to which the venue and artist show counters have been rolled over
+    SINGLETON_ID = 1
+
+    id = db.Column(db.Integer, primary_key=True, nullable=False)
+    synced_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<ShowCounters {self.synced_at}>'
@@ -0,0 +1,190 @@
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+from import_stamp import last_import
+from models import db, Venue, Artist
+
+KINDS = ('venue', 'artist')
+# separates the normalized name from the display name within a key, sorts before any character of a name
+SEPARATOR = '\x00'
+# list slot of the key, id and kind of an entry on top of the key string itself
+ENTRY_OVERHEAD = 8 + 8 + 1
+
+
+def normalize(name):
+    # case, accents and runs of whitespace don't matter when typing a name
+    if name.isascii():
+        return ' '.join(name.lower().split())
+    decomposed = unicodedata.normalize('NFKD', name)
+    return ' '.join(''.join(c for c in decomposed if not unicodedata.combining(c)).casefold().split())
+
+
+class PrefixIndex:
+    """Venue and artist names in sorted arrays, searched for prefixes with bisect.
+
+    Every entry is one 'normalized name NUL display name' string plus its id in an array of longs and its kind in a
+    bytearray, about a hundred bytes per name. Not thread safe, NameIndex does the locking.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.ids = array('q')
+        self.kinds = bytearray()
+        self.size = sys.getsizeof(self.keys) + sys.getsizeof(self.ids) + sys.getsizeof(self.kinds)
+
+    @classmethod
+    def build(cls, entries, memory_budget):
+        # entries are (kind, id, name) tuples in any order, returns None once they exceed memory_budget bytes
+        index = cls()
+        keyed_entries = []
+        for kind, entity_id, name in entries:
+            key = normalize(name) + SEPARATOR + name
+            index.size += sys.getsizeof(key) + ENTRY_OVERHEAD
+            if index.size > memory_budget:
+                return None
+            keyed_entries.append((key, KINDS.index(kind), entity_id))
+        keyed_entries.sort()
+        index.keys = [key for key, _, _ in keyed_entries]
+        index.ids = array('q', (entity_id for _, _, entity_id in keyed_entries))
+        index.kinds = bytearray(kind for _, kind, _ in keyed_entries)
+        return index
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, kind, entity_id, name):
+        key = normalize(name) + SEPARATOR + name
+        kind = KINDS.index(kind)
+        position = bisect_left(self.keys, key)
+        end = position
+        while end < len(self.keys) and self.keys[end] == key:
+            if self.ids[end] == entity_id and self.kinds[end] == kind:
+                return
+            end += 1
+        self.keys.insert(end, key)
+        self.ids.insert(end, entity_id)
+        self.kinds.insert(end, kind)
+        self.size += sys.getsizeof(key) + ENTRY_OVERHEAD
+
+    def search(self, prefix, limit):
+        prefix = normalize(prefix)
+        results = []
+        position = bisect_left(self.keys, prefix)
+        while position < len(self.keys) and len(results) < limit:
+            key = self.keys[position]
+            if not key.startswith(prefix):
+                break
+            results.append({
+                'type': KINDS[self.kinds[position]],
+                'id': self.ids[position],
+                'name': key[key.index(SEPARATOR) + 1:]
+            })
+            position += 1
+        return results
+
+
+class NameIndex:
+    """In-process autocomplete over venue and artist names.
+
+    The index is loaded from the database in a background thread on first use and swapped in once complete, and
+    reloaded every NAME_INDEX_REFRESH seconds to pick up names created by other worker processes, or on the next
+    search after a bulk import touched IMPORT_STAMP_FILE. The create handlers add their names right away. Until a
+    load has finished, or when the names don't fit in NAME_INDEX_MEMORY_BUDGET bytes, search() returns None and
+    callers fall back to the database.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.index = None
+        self.loaded_at = None
+        self.loaded_import = 0
+        self.loading = False
+        self.over_budget = False
+        self.pending = []
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['name_index'] = self
+
+    def search(self, prefix, limit):
+        self._load_if_stale()
+        with self.lock:
+            if self.index is None:
+                return None
+            return self.index.search(prefix, limit)
+
+    def add(self, kind, entity_id, name):
+        with self.lock:
+            if self.loading:
+                # the running load may have read the table before this row was committed
+                self.pending.append((kind, entity_id, name))
+            if self.index is not None:
+                self.index.add(kind, entity_id, name)
+                if self.index.size > self.app.config['NAME_INDEX_MEMORY_BUDGET']:
+                    self._drop_over_budget()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'loaded': self.index is not None,
+                'loading': self.loading,
+                'over_budget': self.over_budget,
+                'names': len(self.index) if self.index is not None else 0,
+                'bytes': self.index.size if self.index is not None else 0,
+                'age_seconds': time.monotonic() - self.loaded_at if self.loaded_at is not None else None
+            }
+
+    def _load_if_stale(self):
+        imported = last_import(self.app.config['IMPORT_STAMP_FILE'])
+        with self.lock:
+            fresh = self.loaded_at is not None and imported == self.loaded_import \
+                and time.monotonic() - self.loaded_at < self.app.config['NAME_INDEX_REFRESH']
+            if self.loading or fresh:
+                return
+            self.loading = True
+            self.loaded_import = imported
+            self.pending = []
+        threading.Thread(target=self._load, name='name-index-load', daemon=True).start()
+
+    def _load(self):
+        index = None
+        try:
+            with self.app.app_context():
+                index = PrefixIndex.build(self._read_names(), self.app.config['NAME_INDEX_MEMORY_BUDGET'])
+        except Exception:
+            self.app.logger.exception('Loading the name index failed')
+            with self.lock:
+                self.loading = False
+                # an import the failed load was meant to pick up still needs one
+                self.loaded_import = None
+            return
+        with self.lock:
+            self.loading = False
+            self.loaded_at = time.monotonic()
+            if index is None:
+                self._drop_over_budget()
+                return
+            for kind, entity_id, name in self.pending:
+                index.add(kind, entity_id, name)
+            self.pending = []
+            self.index = index
+            self.over_budget = False
+
+    def _drop_over_budget(self):
+        self.app.logger.warning('Venue and artist names exceed NAME_INDEX_MEMORY_BUDGET, autocomplete falls back '
+                                'to the database')
+        self.index = None
+        self.over_budget = True
+
+    def _read_names(self):
+        batch_size = self.app.config['STREAM_BATCH_SIZE']
+        for model, kind in ((Venue, 'venue'), (Artist, 'artist')):
+            for entity_id, name in db.session.query(model.id, model.name).yield_per(batch_size):
+                yield kind, entity_id, name
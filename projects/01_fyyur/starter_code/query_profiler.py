@@ -0,0 +1,107 @@
+# Kept identical to projects/02_trivia_api/starter/backend/query_profiler.py: each project is installed and deployed on
+# its own and can't import from the other, so every change goes into both copies.
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import g, request, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PARAMETER = re.compile(r'%\(\w+\)s|%s|\?')
+PARAMETER_LIST = re.compile(r'\(\?(?:, \?)*\)')
+WHITESPACE = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    # parameters and IN lists of any length collapse to one placeholder, so a query run in a loop has one shape
+    shape = PARAMETER.sub('?', statement)
+    shape = PARAMETER_LIST.sub('(?)', shape)
+    return WHITESPACE.sub(' ', shape).strip()
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context() and 'query_profile' in g:
+        conn.info['query_profiler_started'] = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_profiler_started', None)
+    if started is not None and has_app_context() and 'query_profile' in g:
+        profile = g.query_profile
+        profile['count'] += 1
+        profile['seconds'] += time.perf_counter() - started
+        profile['shapes'][statement_shape(statement)] += 1
+
+
+class QueryProfiler:
+    """Counts the SQL statements and database time of each request.
+
+    Opt-in with QUERY_PROFILER_ENABLED. Every profiled response gets X-Query-Count and X-Query-Time-Ms headers,
+    requests running more than QUERY_PROFILER_MAX_QUERIES statements or the same statement shape at least
+    QUERY_PROFILER_REPEAT_THRESHOLD times (the N+1 pattern) are logged and flagged with X-Query-Warning, and the
+    totals are aggregated per route for worst_routes().
+    """
+
+    def __init__(self, app=None):
+        self.routes = {}
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['query_profiler'] = self
+        if not app.config.get('QUERY_PROFILER_ENABLED'):
+            return
+        # the listeners are process wide and only record for requests that started a profile
+        if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+        max_queries = app.config.get('QUERY_PROFILER_MAX_QUERIES', 20)
+        repeat_threshold = app.config.get('QUERY_PROFILER_REPEAT_THRESHOLD', 5)
+
+        @app.before_request
+        def start_query_profile():
+            g.query_profile = {'count': 0, 'seconds': 0.0, 'shapes': Counter()}
+
+        @app.after_request
+        def finish_query_profile(response):
+            profile = g.pop('query_profile', None)
+            if profile is None:
+                return response
+            repeated = [(shape, times) for shape, times in profile['shapes'].most_common() if times >= repeat_threshold]
+            flagged = profile['count'] > max_queries or bool(repeated)
+            response.headers['X-Query-Count'] = str(profile['count'])
+            response.headers['X-Query-Time-Ms'] = f"{profile['seconds'] * 1000:.1f}"
+            if flagged:
+                response.headers['X-Query-Warning'] = 'repeated-statements' if repeated else 'too-many-queries'
+                app.logger.warning('%s %s ran %d queries in %.1f ms%s', request.method, request.path,
+                                   profile['count'], profile['seconds'] * 1000,
+                                   ''.join(f'\n  {times}x {shape}' for shape, times in repeated))
+            self.record(f'{request.method} {request.url_rule.rule if request.url_rule else request.path}',
+                        profile, flagged)
+            return response
+
+    def record(self, route, profile, flagged):
+        with self.lock:
+            stats = self.routes.setdefault(route, {
+                'requests': 0, 'flagged_requests': 0, 'queries': 0, 'max_queries': 0, 'db_seconds': 0.0,
+                'max_db_seconds': 0.0
+            })
+            stats['requests'] += 1
+            stats['flagged_requests'] += flagged
+            stats['queries'] += profile['count']
+            stats['max_queries'] = max(stats['max_queries'], profile['count'])
+            stats['db_seconds'] += profile['seconds']
+            stats['max_db_seconds'] = max(stats['max_db_seconds'], profile['seconds'])
+
+    def worst_routes(self, limit=20):
+        # routes with the most queries per request first
+        with self.lock:
+            routes = [dict(stats, route=route) for route, stats in self.routes.items()]
+        for stats in routes:
+            stats['avg_queries'] = stats['queries'] / stats['requests']
+            stats['avg_db_ms'] = stats['db_seconds'] * 1000 / stats['requests']
+        routes.sort(key=lambda stats: (stats['avg_queries'], stats['avg_db_ms']), reverse=True)
+        return routes[:limit]
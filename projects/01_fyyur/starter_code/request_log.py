@@ -0,0 +1,103 @@
+import atexit
+import queue
+import threading
+import time
+from logging import Formatter
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+from flask import g, request, has_app_context
+from flask.logging import default_handler
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking or raising when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.dropped_lock = threading.Lock()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self.dropped_lock:
+                self.dropped += 1
+
+
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    # process wide like the profiler's listeners, only counts for requests that started a count
+    if has_app_context() and 'request_query_count' in g:
+        g.request_query_count += 1
+
+
+def file_handler(config):
+    # LOG_ROTATE_WHEN switches from size based to time based rotation
+    if config['LOG_ROTATE_WHEN']:
+        handler = TimedRotatingFileHandler(config['LOG_FILE'], when=config['LOG_ROTATE_WHEN'],
+                                           backupCount=config['LOG_BACKUP_COUNT'], delay=True)
+    else:
+        handler = RotatingFileHandler(config['LOG_FILE'], maxBytes=config['LOG_MAX_BYTES'],
+                                      backupCount=config['LOG_BACKUP_COUNT'], delay=True)
+    handler.setFormatter(Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
+    return handler
+
+
+def init_logging(app):
+    """Sends app.logger records through a bounded queue to a background thread writing the rotated log file.
+
+    Request threads only put records on the queue, so a slow or full disk never delays a response; once
+    LOG_QUEUE_SIZE records are waiting new ones are dropped and counted instead. With LOG_REQUESTS every request
+    gets a line with its route, status, latency and number of SQL statements, counted by a listener of its own so
+    that it doesn't depend on the QueryProfiler being enabled.
+    """
+    log_queue = queue.Queue(app.config['LOG_QUEUE_SIZE'])
+    queue_handler = DroppingQueueHandler(log_queue)
+    listener = QueueListener(log_queue, file_handler(app.config), respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    app.logger.setLevel(app.config['LOG_LEVEL'])
+    # Flask's stderr handler would still write synchronously on the request thread
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(queue_handler)
+    app.extensions['request_log'] = queue_handler
+
+    if not app.config['LOG_REQUESTS']:
+        return
+
+    if not event.contains(Engine, 'after_cursor_execute', count_query):
+        event.listen(Engine, 'after_cursor_execute', count_query)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.request_query_count = 0
+
+    @app.after_request
+    def log_request(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        latency_ms = (time.perf_counter() - started) * 1000
+        fields = {
+            'method': request.method,
+            'route': request.url_rule.rule if request.url_rule else None,
+            'path': request.path,
+            'status': response.status_code,
+            'latency_ms': round(latency_ms, 1),
+            'queries': g.get('request_query_count')
+        }
+        app.logger.info(' '.join(f'{name}={value}' for name, value in fields.items() if value is not None),
+                        extra=fields)
+        return response
+
+
+def logging_stats(app):
+    queue_handler = app.extensions.get('request_log')
+    if queue_handler is None:
+        return {'enabled': False}
+    with queue_handler.dropped_lock:
+        dropped = queue_handler.dropped
+    return {'enabled': True, 'queued': queue_handler.queue.qsize(), 'dropped': dropped}
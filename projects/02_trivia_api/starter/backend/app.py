@@ -1,7 +1,10 @@
 from flask import Flask
 from flask_cors import CORS
 
+from category_cache import CategoryCache
 from db import init_db
+from query_profiler import QueryProfiler
+from quiz_sessions import QuizSessions
 from routes import init_routes
 
 
@@ -9,6 +12,9 @@ def create_app(config_file):
     app = Flask(__name__)
     app.config.from_object(config_file)
     init_db(app)
+    QueryProfiler(app)
+    CategoryCache(app)
+    QuizSessions(app)
     init_routes(app)
     CORS(app)
     return app
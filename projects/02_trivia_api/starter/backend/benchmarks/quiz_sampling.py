@@ -0,0 +1,81 @@
+"""Cost of picking the next quiz question, loading every candidate versus random_question.
+
+Fills a scratch database with QUESTIONS_PER_CATEGORY questions in each of two categories and times both ways with
+PLAYED questions already answered. Run from the backend directory against a database that may be dropped:
+BENCHMARK_DATABASE_URI=postgresql://postgres@localhost/trivia_benchmark python benchmarks/quiz_sampling.py
+Without BENCHMARK_DATABASE_URI a temporary SQLite file is used.
+"""
+import os
+import random
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from db import db, Question  # noqa: E402
+from routes import random_question  # noqa: E402
+
+QUESTIONS_PER_CATEGORY = 100000
+CATEGORIES = ('1', '2')
+PLAYED = 20
+PICKS = 10
+REPEAT = 3
+
+
+def fill():
+    db.drop_all()
+    db.create_all()
+    for category in CATEGORIES:
+        db.session.bulk_insert_mappings(Question, [
+            {'question': f'question {i}', 'answer': 'answer', 'category': category, 'difficulty': i % 5 + 1}
+            for i in range(QUESTIONS_PER_CATEGORY)
+        ])
+    db.session.commit()
+    db.session.execute('ANALYZE')
+    db.session.commit()
+    print(f'{len(CATEGORIES) * QUESTIONS_PER_CATEGORY} questions, {PLAYED} of them played')
+
+
+def main():
+    temporary_directory = None
+    database = os.environ.get('BENCHMARK_DATABASE_URI')
+    if database is None:
+        temporary_directory = tempfile.TemporaryDirectory()
+        database = 'sqlite:///' + os.path.join(temporary_directory.name, 'quiz_sampling.db')
+
+    class BenchmarkConfig:
+        SQLALCHEMY_DATABASE_URI = database
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    app = create_app(BenchmarkConfig)
+    with app.app_context():
+        fill()
+        category = CATEGORIES[-1]
+        questions_query = Question.query.filter(Question.category == category)
+        played = [question_id for (question_id,) in questions_query.with_entities(Question.id)
+                  .order_by(db.func.random()).limit(PLAYED)]
+
+        def before():
+            for _ in range(PICKS):
+                random.choice(questions_query.filter(Question.id.notin_(played)).all())
+                db.session.expunge_all()
+
+        def after():
+            for _ in range(PICKS):
+                question = random_question(questions_query, played)
+                assert question.id not in played
+                db.session.expunge_all()
+
+        for name, function in (('before', before), ('after', after)):
+            best = min(timeit.repeat(function, number=1, repeat=REPEAT))
+            print(f'{name:>6}: {best / PICKS * 1e3:9.3f} ms per question ({PICKS} picks, best of {REPEAT})')
+        db.session.remove()
+        db.drop_all()
+    if temporary_directory is not None:
+        temporary_directory.cleanup()
+
+
+if __name__ == '__main__':
+    main()
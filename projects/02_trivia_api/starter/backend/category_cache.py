@@ -0,0 +1,102 @@
+import hashlib
+import threading
+import time
+from itertools import chain
+
+from flask import json, request, abort, current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from db import Category
+from model_mapper import map_categories_response
+
+# bumped whenever a transaction writing categories commits, caches loaded before that reload on their next use
+generation = 0
+generation_lock = threading.Lock()
+
+
+def note_category_writes(session, flush_context):
+    if any(isinstance(instance, Category) for instance in chain(session.new, session.dirty, session.deleted)):
+        session.info['categories_written'] = True
+
+
+def bump_generation(session):
+    global generation
+    if session.info.pop('categories_written', False):
+        with generation_lock:
+            generation += 1
+
+
+def forget_category_writes(session):
+    session.info.pop('categories_written', None)
+
+
+if not event.contains(Session, 'after_flush', note_category_writes):
+    event.listen(Session, 'after_flush', note_category_writes)
+    event.listen(Session, 'after_commit', bump_generation)
+    event.listen(Session, 'after_rollback', forget_category_writes)
+
+
+class CategoryCache:
+    """Keeps the mapped categories and the serialized /categories response of the process.
+
+    Entries are reloaded after CATEGORY_CACHE_TTL seconds, which bounds how long writes made by other processes go
+    unnoticed, and right away after this process commits a category write or invalidate() is called.
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 0
+        self.entry = None
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('CATEGORY_CACHE_TTL', 300)
+        app.extensions['category_cache'] = self
+
+    def categories(self):
+        # {id: type} as returned by map_categories
+        return self._entry()['categories']
+
+    def category(self, category_id):
+        # (id, type) as returned by map_category, 404 for unknown ids
+        categories = self.categories()
+        try:
+            category_id = int(category_id)
+        except ValueError:
+            abort(404)
+        if category_id not in categories:
+            abort(404)
+        return category_id, categories[category_id]
+
+    def categories_response(self):
+        entry = self._entry()
+        if not entry['categories']:
+            abort(404)
+        response = current_app.response_class(entry['body'], mimetype='application/json')
+        response.set_etag(entry['etag'])
+        return response.make_conditional(request)
+
+    def invalidate(self):
+        with self.lock:
+            self.entry = None
+
+    def _entry(self):
+        with self.lock:
+            entry = self.entry
+            if entry is None or entry['generation'] != generation or entry['expires_at'] <= time.monotonic():
+                entry = self.entry = self._load()
+            return entry
+
+    def _load(self):
+        loaded_generation = generation
+        response = map_categories_response(Category.query.order_by(Category.id).all())
+        body = json.dumps(response)
+        return {
+            'categories': response['categories'],
+            'body': body,
+            'etag': hashlib.sha1(body.encode()).hexdigest(),
+            'generation': loaded_generation,
+            'expires_at': time.monotonic() + self.ttl
+        }
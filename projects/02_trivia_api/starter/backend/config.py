@@ -14,3 +14,14 @@ SECRET_KEY = os.urandom(32)
 SERVER_NAME = f'{address}:{port}'
 SQLALCHEMY_DATABASE_URI = f'postgres://{db_user}:{db_psw}@{address}:{db_port}/{db_name}'
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+QUERY_PROFILER_ENABLED = False
+QUERY_PROFILER_MAX_QUERIES = 20
+QUERY_PROFILER_REPEAT_THRESHOLD = 5
+
+CATEGORY_CACHE_TTL = 300
+
+QUIZ_SESSION_STORE = 'memory'
+QUIZ_SESSION_MAX_ENTRIES = 10000
+QUIZ_SESSION_TTL = 3600
+QUIZ_SESSION_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'quiz_sessions.db')
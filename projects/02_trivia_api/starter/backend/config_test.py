@@ -1,3 +1,5 @@
+import os
+
 address = 'localhost'
 db_user = 'postgres'
 db_psw = 'postgres'
@@ -7,3 +9,14 @@ db_name = 'trivia_test'
 DEBUG = True
 SQLALCHEMY_DATABASE_URI = f'postgres://{db_user}:{db_psw}@{address}:{db_port}/{db_name}'
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+QUERY_PROFILER_ENABLED = True
+QUERY_PROFILER_MAX_QUERIES = 20
+QUERY_PROFILER_REPEAT_THRESHOLD = 5
+
+CATEGORY_CACHE_TTL = 300
+
+QUIZ_SESSION_STORE = 'memory'
+QUIZ_SESSION_MAX_ENTRIES = 10000
+QUIZ_SESSION_TTL = 3600
+QUIZ_SESSION_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'quiz_sessions.db')
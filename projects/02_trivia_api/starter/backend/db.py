@@ -1,5 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import Column, String, Integer, Index
 
 db = SQLAlchemy()
 
@@ -10,6 +10,8 @@ def init_db(app):
 
 class Question(db.Model):
     __tablename__ = 'questions'
+    # quizzes look up the lowest, highest and next id of a category
+    __table_args__ = (Index('ix_questions_category_id', 'category', 'id'),)
 
     id = Column(Integer, primary_key=True)
     question = Column(String)
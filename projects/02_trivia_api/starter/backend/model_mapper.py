@@ -1,21 +1,15 @@
-import random
-
-QUESTIONS_PER_PAGE = 10
-
-
-def map_questions_response(questions, current_page, categories, current_category):
+def map_questions_response(questions, total_questions, categories, current_category):
+    # categories are already mapped by map_categories
     return {
-        'questions': map_questions(questions, current_page),
-        'total_questions': len(questions),
-        'categories': map_categories(categories),
+        'questions': map_questions(questions),
+        'total_questions': total_questions,
+        'categories': categories,
         'current_category': current_category
     }
 
 
-def map_questions(questions, current_page):
-    start = (current_page - 1) * QUESTIONS_PER_PAGE
-    end = start + QUESTIONS_PER_PAGE
-    return [map_question(question) for question in questions[start:end]]
+def map_questions(questions):
+    return [map_question(question) for question in questions]
 
 
 def map_question(question):
@@ -48,7 +42,14 @@ def map_success():
     }
 
 
-def map_quizzes_response(available_questions):
+def map_quiz_session_response(session_id, total_questions):
+    return {
+        'session_id': session_id,
+        'total_questions': total_questions
+    }
+
+
+def map_quiz_question_response(question):
     return {
-        'question': map_question(random.choice(available_questions)) if available_questions else None
+        'question': map_question(question) if question else None
     }
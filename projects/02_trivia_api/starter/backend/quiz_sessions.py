@@ -0,0 +1,134 @@
+import random
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+
+class MemorySessionStore:
+    """Quiz sessions in an in-process LRU bounded by number of sessions."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def create(self, session_id, deck):
+        with self.lock:
+            self.sessions[session_id] = {'deck': deck, 'position': 0, 'expires_at': time.time() + self.ttl}
+            while len(self.sessions) > self.max_entries:
+                self.sessions.popitem(last=False)
+
+    def pop(self, session_id):
+        # the next question id of the deck, None once it is used up, KeyError for unknown or expired sessions
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None or session['expires_at'] <= time.time():
+                self.sessions.pop(session_id, None)
+                raise KeyError(session_id)
+            self.sessions.move_to_end(session_id)
+            session['expires_at'] = time.time() + self.ttl
+            if session['position'] >= len(session['deck']):
+                return None
+            session['position'] += 1
+            return session['deck'][session['position'] - 1]
+
+
+class SqliteSessionStore:
+    """Quiz sessions in a local SQLite file, shared by the worker processes of a host and kept across restarts.
+
+    A deck is stored one row per card, so taking the next card reads and updates single rows whatever the deck size.
+    """
+
+    def __init__(self, file_name, ttl):
+        self.file_name = file_name
+        self.ttl = ttl
+        with closing(self._connect()) as connection, connection:
+            connection.executescript('''
+                CREATE TABLE IF NOT EXISTS quiz_sessions (
+                    id TEXT PRIMARY KEY, next_position INTEGER NOT NULL, size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ix_quiz_sessions_expires_at ON quiz_sessions (expires_at);
+                CREATE TABLE IF NOT EXISTS quiz_session_cards (
+                    session_id TEXT NOT NULL, position INTEGER NOT NULL, question_id INTEGER NOT NULL,
+                    PRIMARY KEY (session_id, position)
+                );
+            ''')
+
+    def create(self, session_id, deck):
+        now = time.time()
+        with closing(self._connect()) as connection, connection:
+            self._delete_expired(connection, now)
+            connection.execute('INSERT INTO quiz_sessions VALUES (?, 0, ?, ?)',
+                               (session_id, len(deck), now + self.ttl))
+            connection.executemany('INSERT INTO quiz_session_cards VALUES (?, ?, ?)',
+                                   ((session_id, position, question_id) for position, question_id in enumerate(deck)))
+
+    def pop(self, session_id):
+        now = time.time()
+        with closing(self._connect()) as connection, connection:
+            # taken before reading so that concurrent requests of one session never get the same card
+            connection.execute('BEGIN IMMEDIATE')
+            session = connection.execute(
+                'SELECT next_position, size FROM quiz_sessions WHERE id = ? AND expires_at > ?',
+                (session_id, now)).fetchone()
+            if session is None:
+                raise KeyError(session_id)
+            position, size = session
+            connection.execute('UPDATE quiz_sessions SET next_position = ?, expires_at = ? WHERE id = ?',
+                               (min(position + 1, size), now + self.ttl, session_id))
+            if position >= size:
+                return None
+            (question_id,) = connection.execute(
+                'SELECT question_id FROM quiz_session_cards WHERE session_id = ? AND position = ?',
+                (session_id, position)).fetchone()
+            return question_id
+
+    def _connect(self):
+        # used as `with closing(...) as connection, connection:` to commit or roll back and then close
+        return sqlite3.connect(self.file_name, timeout=10)
+
+    @staticmethod
+    def _delete_expired(connection, now):
+        connection.execute('DELETE FROM quiz_session_cards WHERE session_id IN '
+                           '(SELECT id FROM quiz_sessions WHERE expires_at <= ?)', (now,))
+        connection.execute('DELETE FROM quiz_sessions WHERE expires_at <= ?', (now,))
+
+
+class QuizSessions:
+    """Server side quiz decks: a session holds the shuffled ids of a category's questions and hands them out in turn.
+
+    QUIZ_SESSION_STORE picks the storage, 'memory' for an LRU of at most QUIZ_SESSION_MAX_ENTRIES sessions per
+    process or 'sqlite' for a QUIZ_SESSION_DB file shared by the processes of a host. Sessions expire
+    QUIZ_SESSION_TTL seconds after their last use.
+    """
+
+    def __init__(self, app=None):
+        self.store = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        store = app.config.get('QUIZ_SESSION_STORE', 'memory')
+        ttl = app.config.get('QUIZ_SESSION_TTL', 3600)
+        if store == 'memory':
+            self.store = MemorySessionStore(app.config.get('QUIZ_SESSION_MAX_ENTRIES', 10000), ttl)
+        elif store == 'sqlite':
+            self.store = SqliteSessionStore(app.config['QUIZ_SESSION_DB'], ttl)
+        else:
+            raise ValueError(f'Unknown QUIZ_SESSION_STORE {store!r}')
+        app.extensions['quiz_sessions'] = self
+
+    def create(self, question_ids):
+        deck = list(question_ids)
+        random.shuffle(deck)
+        session_id = secrets.token_urlsafe(16)
+        self.store.create(session_id, deck)
+        return session_id, len(deck)
+
+    def next_question_id(self, session_id):
+        return self.store.pop(session_id)
@@ -1,16 +1,63 @@
+import base64
+import json
+import random
+
 from flask import request, jsonify, abort
 
-from model_mapper import map_success, map_categories_response, map_category, map_questions_response, \
-    map_quizzes_response
-from db import Question, Category
+from model_mapper import map_success, map_questions_response, map_quiz_session_response, map_quiz_question_response
+from db import Question
+
+QUESTIONS_PER_PAGE = 10
+# random draws a quiz makes before walking to the next question not played
+QUIZ_SAMPLE_ATTEMPTS = 5
+
+
+def encode_cursor(after, total):
+    return base64.urlsafe_b64encode(json.dumps({'after': after, 'total': total}).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not (isinstance(decoded.get('after'), int) and isinstance(decoded.get('total'), int)):
+            raise ValueError(cursor)
+        return decoded
+    except (ValueError, AttributeError, TypeError):
+        abort(400)
+
+
+def random_question(questions_query, excluded_ids):
+    # draws a random id between the lowest and highest of the query and takes the first question from there on,
+    # drawing again if that one was played, so a question's odds follow the gap in the ids before it and played
+    # questions don't pass their share on. Each draw is an index lookup on (category, id). After QUIZ_SAMPLE_ATTEMPTS
+    # played draws, likely only once most of the category is played, it walks from the last draw to the next question
+    # not played, wrapping around, which favours questions right after a run of played ones.
+    question_ids = questions_query.with_entities(Question.id)
+    # separate queries, as not every database answers min() and max() together from an index
+    lowest = question_ids.order_by(Question.id).limit(1).scalar()
+    if lowest is None:
+        return None
+    highest = question_ids.order_by(Question.id.desc()).limit(1).scalar()
+    excluded_ids = set(excluded_ids or ())
+    for _ in range(QUIZ_SAMPLE_ATTEMPTS):
+        pivot = random.randint(lowest, highest)
+        question_id = question_ids.filter(Question.id >= pivot).order_by(Question.id).limit(1).scalar()
+        if question_id not in excluded_ids:
+            return Question.query.get(question_id)
+    if excluded_ids:
+        questions_query = questions_query.filter(Question.id.notin_(excluded_ids))
+    return questions_query.filter(Question.id >= pivot).order_by(Question.id).first() \
+        or questions_query.filter(Question.id < pivot).order_by(Question.id).first()
 
 
 def init_routes(app):
+    category_cache = app.extensions['category_cache']
+    quiz_sessions = app.extensions['quiz_sessions']
+
     @app.route('/questions', methods=['GET'])
     def get_questions():
-        questions = Question.query.all()
         current_category = None
-        response = get_questions_response(questions, current_category)
+        response = get_questions_response(Question.query, current_category)
         if response['categories']:
             return jsonify(response)
         else:
@@ -35,7 +82,7 @@ def init_routes(app):
                 abort(400)
 
     def get_questions_by_search_query(search_query):
-        questions = Question.query.filter(Question.question.ilike('%{}%'.format(search_query))).all()
+        questions = Question.query.filter(Question.question.ilike('%{}%'.format(search_query)))
         current_category = None
         return jsonify(get_questions_response(questions, current_category))
 
@@ -50,35 +97,89 @@ def init_routes(app):
 
     @app.route('/categories', methods=['GET'])
     def get_categories():
-        categories = Category.query.all()
-        if categories:
-            return jsonify(map_categories_response(categories))
-        else:
-            abort(404)
+        return category_cache.categories_response()
 
     @app.route('/categories/<string:category_id>/questions', methods=['GET'])
     def get_questions_of_category(category_id):
-        questions = questions_of_category_query(category_id).all()
-        current_category = map_category(Category.query.get(category_id))
+        questions = questions_of_category_query(category_id)
+        current_category = category_cache.category(category_id)
         return jsonify(get_questions_response(questions, current_category))
 
-    def get_questions_response(questions, current_category):
+    def get_questions_response(questions_query, current_category):
+        if 'cursor' in request.args:
+            return get_questions_response_after_cursor(questions_query, current_category)
+        # only the requested page is loaded, the total comes from a COUNT over the same filter
         current_page = request.args.get('page', 1, type=int)
-        categories = Category.query.all()
-        return map_questions_response(questions, current_page, categories, current_category)
+        if current_page < 1:
+            abort(400)
+        questions = questions_query.order_by(Question.id) \
+            .offset((current_page - 1) * QUESTIONS_PER_PAGE) \
+            .limit(QUESTIONS_PER_PAGE) \
+            .all()
+        total_questions = questions_query.order_by(None).count()
+        categories = category_cache.categories()
+        return map_questions_response(questions, total_questions, categories, current_category)
+
+    def get_questions_response_after_cursor(questions_query, current_category):
+        # ?cursor= (empty for the first page) pages on Question.id, so every page costs one index range scan and
+        # rows added or deleted meanwhile don't shift later pages; the total is counted once and carried along
+        cursor = decode_cursor(request.args['cursor']) if request.args['cursor'] else None
+        if cursor:
+            questions_query_page = questions_query.filter(Question.id > cursor['after'])
+            total_questions = cursor['total']
+        else:
+            questions_query_page = questions_query
+            total_questions = questions_query.order_by(None).count()
+        questions = questions_query_page.order_by(Question.id).limit(QUESTIONS_PER_PAGE + 1).all()
+        has_more = len(questions) > QUESTIONS_PER_PAGE
+        questions = questions[:QUESTIONS_PER_PAGE]
+        categories = category_cache.categories()
+        response = map_questions_response(questions, total_questions, categories, current_category)
+        response['next_cursor'] = encode_cursor(questions[-1].id, total_questions) if has_more else None
+        return response
+
+    @app.route('/quizzes/sessions', methods=['POST'])
+    def post_quiz_sessions():
+        # starts a quiz whose questions are dealt by the server, only the question ids of the category are loaded
+        quiz_category = request.get_json().get('quiz_category')
+        if not quiz_category:
+            abort(400)
+        question_ids = questions_of_category_query(quiz_category['id']).with_entities(Question.id)
+        session_id, total_questions = quiz_sessions.create(question_id for (question_id,) in question_ids)
+        return jsonify(map_quiz_session_response(session_id, total_questions))
 
     @app.route('/quizzes', methods=['POST'])
     def post_quizzes():
         request_json = request.get_json()
+        session_id = request_json.get('session_id')
+        if session_id:
+            return jsonify(map_quiz_question_response(next_question_of_session(session_id)))
         previous_question_ids = request_json.get('previous_questions')
         quiz_category = request_json.get('quiz_category')
-        available_questions = questions_of_category_query(quiz_category['id']) \
-            .filter(Question.id.notin_(previous_question_ids)).all()
-        return jsonify(map_quizzes_response(available_questions))
+        question = random_question(questions_of_category_query(quiz_category['id']), previous_question_ids)
+        return jsonify(map_quiz_question_response(question))
+
+    def next_question_of_session(session_id):
+        # questions deleted since the session started are skipped
+        while True:
+            try:
+                question_id = quiz_sessions.next_question_id(session_id)
+            except KeyError:
+                abort(404)
+            if question_id is None:
+                return None
+            question = Question.query.get(question_id)
+            if question is not None:
+                return question
 
     def questions_of_category_query(category_id):
         return Question.query if category_id == 0 else Question.query.filter(Question.category == category_id)
 
+    @app.route('/stats/queries', methods=['GET'])
+    def get_query_stats():
+        query_profiler = app.extensions['query_profiler']
+        return jsonify(routes=query_profiler.worst_routes(request.args.get('limit', 20, type=int)))
+
     @app.after_request
     def after_request(response):
         response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,true')
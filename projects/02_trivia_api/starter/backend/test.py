@@ -1,8 +1,11 @@
 import json
+import os
+import tempfile
 import unittest
 
 from app import create_app
 from db import db, Question, Category
+from quiz_sessions import SqliteSessionStore
 
 
 class TriviaTestCase(unittest.TestCase):
@@ -49,6 +52,74 @@ class TriviaTestCase(unittest.TestCase):
             assert data['categories'] == {'1': 'category', '2': 'category2'}
             assert data['current_category'] is None
 
+    def test_get_questions_page_past_the_end(self):
+        with self.app.app_context():
+            self.insert_data_to_database()
+
+            res = self.client().get('/questions', query_string={'page': '3'})
+
+            data = json.loads(res.data)
+            assert res.status_code == 200
+            assert len(data['questions']) == 0
+            assert data['total_questions'] == 12
+            assert data['categories'] == {'1': 'category', '2': 'category2'}
+
+    def test_get_questions_invalid_page(self):
+        with self.app.app_context():
+            self.insert_data_to_database()
+
+            res = self.client().get('/questions', query_string={'page': '0'})
+
+            data = json.loads(res.data)
+            assert res.status_code == 400
+            assert data['error'] == 'bad request'
+
+    def test_get_questions_with_cursor(self):
+        with self.app.app_context():
+            self.insert_data_to_database()
+
+            res = self.client().get('/questions', query_string={'cursor': ''})
+
+            data = json.loads(res.data)
+            assert res.status_code == 200
+            assert [question['id'] for question in data['questions']] == list(range(1, 11))
+            assert data['total_questions'] == 12
+            assert data['categories'] == {'1': 'category', '2': 'category2'}
+            assert data['next_cursor']
+
+            # deleting a question of the first page doesn't shift the second one
+            self.client().delete('/questions/1')
+            res = self.client().get('/questions', query_string={'cursor': data['next_cursor']})
+
+            data = json.loads(res.data)
+            assert res.status_code == 200
+            assert [question['id'] for question in data['questions']] == [11, 12]
+            assert data['total_questions'] == 12
+            assert data['next_cursor'] is None
+
+    def test_post_questions_search_with_cursor(self):
+        with self.app.app_context():
+            self.insert_data_to_database()
+            request_json = {'searchTerm': 'question1'}
+
+            res = self.client().post('/questions', json=request_json, query_string={'cursor': ''})
+
+            data = json.loads(res.data)
+            assert res.status_code == 200
+            assert [question['id'] for question in data['questions']] == [10, 11]
+            assert data['total_questions'] == 2
+            assert data['next_cursor'] is None
+
+    def test_get_questions_invalid_cursor(self):
+        with self.app.app_context():
+            self.insert_data_to_database()
+
+            res = self.client().get('/questions', query_string={'cursor': 'not-a-cursor'})
+
+            data = json.loads(res.data)
+            assert res.status_code == 400
+            assert data['error'] == 'bad request'
+
     # valid case after user deletes all questions
     def test_get_questions_no_questions_with_categories(self):
         with self.app.app_context():
@@ -196,6 +267,39 @@ class TriviaTestCase(unittest.TestCase):
             assert res.status_code == 404
             assert data['error'] == 'resource not found'
 
+    def test_get_categories_not_modified(self):
+        with self.app.app_context():
+            self.insert_data_to_database()
+            etag = self.client().get('/categories').headers['ETag']
+
+            res = self.client().get('/categories', headers={'If-None-Match': etag})
+
+            assert res.status_code == 304
+            assert res.headers['X-Query-Count'] == '0'
+
+    def test_get_categories_after_category_added(self):
+        with self.app.app_context():
+            self.insert_data_to_database()
+            self.client().get('/categories')
+            self.db.session.add(Category('category3'))
+            self.db.session.commit()
+
+            res = self.client().get('/categories')
+
+            data = json.loads(res.data)
+            assert res.status_code == 200
+            assert data['categories'] == {'1': 'category', '2': 'category2', '3': 'category3'}
+
+    def test_get_questions_of_category_does_not_exist(self):
+        with self.app.app_context():
+            self.insert_data_to_database()
+
+            res = self.client().get('/categories/5/questions')
+
+            data = json.loads(res.data)
+            assert res.status_code == 404
+            assert data['error'] == 'resource not found'
+
     def test_get_questions_of_category(self):
         with self.app.app_context():
             self.insert_data_to_database()
@@ -212,6 +316,21 @@ class TriviaTestCase(unittest.TestCase):
             assert data['categories'] == {'1': 'category', '2': 'category2'}
             assert data['current_category'] == [1, 'category']
 
+    def test_get_questions_of_category_page_2(self):
+        with self.app.app_context():
+            self.insert_data_to_database()
+            for i in range(6):
+                self.db.session.add(Question(f'extra{i}', 'answer', '2', 3))
+            self.db.session.commit()
+
+            res = self.client().get('/categories/2/questions', query_string={'page': '2'})
+
+            data = json.loads(res.data)
+            assert res.status_code == 200
+            assert [question['question'] for question in data['questions']] == ['extra5']
+            assert data['total_questions'] == 11
+            assert data['current_category'] == [2, 'category2']
+
     def test_post_quizzes_no_questions_played_has_a_question(self):
         with self.app.app_context():
             self.insert_data_to_database()
@@ -287,6 +406,101 @@ class TriviaTestCase(unittest.TestCase):
             assert res.status_code == 200
             assert data['question']
 
+    def test_post_quizzes_never_repeats_played_questions(self):
+        with self.app.app_context():
+            self.insert_data_to_database()
+            request_json = {
+                'previous_questions': [1, 2, 3, 12],
+                'quiz_category': {
+                    'id': '1', 'type': 'category'
+                }
+            }
+
+            question_ids = set()
+            for _ in range(20):
+                res = self.client().post('/quizzes', json=request_json)
+                question_ids.add(json.loads(res.data)['question']['id'])
+
+            assert question_ids <= {6, 7, 10}
+
+    def test_get_questions_reports_query_count(self):
+        with self.app.app_context():
+            self.insert_data_to_database()
+
+            res = self.client().get('/questions')
+
+            assert res.status_code == 200
+            assert int(res.headers['X-Query-Count']) > 0
+            assert float(res.headers['X-Query-Time-Ms']) >= 0
+            assert 'X-Query-Warning' not in res.headers
+
+    def test_get_query_stats(self):
+        with self.app.app_context():
+            self.insert_data_to_database()
+            self.client().get('/questions')
+            self.client().get('/questions')
+
+            res = self.client().get('/stats/queries')
+
+            data = json.loads(res.data)
+            assert res.status_code == 200
+            assert len(data['routes']) == 1
+            assert data['routes'][0]['route'] == 'GET /questions'
+            assert data['routes'][0]['requests'] == 2
+            assert data['routes'][0]['flagged_requests'] == 0
+
+    def test_post_quizzes_session_deals_every_question_once(self):
+        with self.app.app_context():
+            self.insert_data_to_database()
+            res = self.client().post('/quizzes/sessions', json={'quiz_category': {'id': '1', 'type': 'category'}})
+            data = json.loads(res.data)
+            assert res.status_code == 200
+            assert data['total_questions'] == 7
+
+            question_ids = []
+            for _ in range(7):
+                res = self.client().post('/quizzes', json={'session_id': data['session_id']})
+                question_ids.append(json.loads(res.data)['question']['id'])
+            res = self.client().post('/quizzes', json={'session_id': data['session_id']})
+
+            assert res.status_code == 200
+            assert json.loads(res.data)['question'] is None
+            assert sorted(question_ids) == [1, 2, 3, 6, 7, 10, 12]
+
+    def test_post_quizzes_session_skips_deleted_question(self):
+        with self.app.app_context():
+            self.insert_data_to_database()
+            res = self.client().post('/quizzes/sessions', json={'quiz_category': {'id': 0, 'type': 'click'}})
+            session_id = json.loads(res.data)['session_id']
+            self.client().delete('/questions/1')
+
+            question_ids = []
+            for _ in range(11):
+                res = self.client().post('/quizzes', json={'session_id': session_id})
+                question = json.loads(res.data)['question']
+                if question:
+                    question_ids.append(question['id'])
+
+            assert len(question_ids) == 11
+            assert 1 not in question_ids
+
+    def test_post_quizzes_session_does_not_exist(self):
+        with self.app.app_context():
+            res = self.client().post('/quizzes', json={'session_id': 'unknown'})
+
+            data = json.loads(res.data)
+            assert res.status_code == 404
+            assert data['error'] == 'resource not found'
+
+    def test_sqlite_session_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = SqliteSessionStore(os.path.join(directory, 'quiz_sessions.db'), 3600)
+            store.create('session', [3, 1, 2])
+
+            assert [store.pop('session') for _ in range(4)] == [3, 1, 2, None]
+            with self.assertRaises(KeyError):
+                store.pop('unknown')
+
     def reset_database(self):
         with self.app.app_context():
             self.db.session.close()